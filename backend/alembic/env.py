@@ -17,7 +17,8 @@ if config.config_file_name is not None:
 # add your model's MetaData object here
 # for 'autogenerate' support
 from app.db.session import Base
-from app.models.gtfs import Stop, Route, Trip, StopTime
+from app.models.gtfs import Stop, Route, Trip, StopTime, ServiceCalendar, CalendarDate, FeedFile
+from app.models.realtime import VehiclePositionObservation, TripUpdateObservation
 from app.core.config import settings
 
 target_metadata = Base.metadata
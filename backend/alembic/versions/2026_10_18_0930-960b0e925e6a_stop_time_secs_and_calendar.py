@@ -0,0 +1,61 @@
+"""stop_time_secs_and_calendar
+
+Revision ID: 960b0e925e6a
+Revises: a42b421cdb30
+Create Date: 2026-10-18 09:30:12.481920
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '960b0e925e6a'
+down_revision = 'a42b421cdb30'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('stop_times', sa.Column('arrival_secs', sa.Integer(), nullable=True))
+    op.add_column('stop_times', sa.Column('departure_secs', sa.Integer(), nullable=True))
+
+    # Backfill from the HH:MM:SS text columns (hours may be >= 24 for after-midnight trips)
+    for col in ('arrival', 'departure'):
+        op.execute(f"""
+            UPDATE stop_times
+            SET {col}_secs = split_part(trim({col}_time), ':', 1)::int * 3600
+                           + split_part(trim({col}_time), ':', 2)::int * 60
+                           + split_part(trim({col}_time), ':', 3)::int
+            WHERE trim({col}_time) ~ '^[0-9]+:[0-9]{{2}}:[0-9]{{2}}$'
+        """)
+
+    op.create_index('ix_stop_times_stop_id_arrival_secs', 'stop_times', ['stop_id', 'arrival_secs'], unique=False)
+
+    op.create_table('calendar',
+    sa.Column('service_id', sa.String(), nullable=False),
+    sa.Column('monday', sa.Integer(), nullable=False),
+    sa.Column('tuesday', sa.Integer(), nullable=False),
+    sa.Column('wednesday', sa.Integer(), nullable=False),
+    sa.Column('thursday', sa.Integer(), nullable=False),
+    sa.Column('friday', sa.Integer(), nullable=False),
+    sa.Column('saturday', sa.Integer(), nullable=False),
+    sa.Column('sunday', sa.Integer(), nullable=False),
+    sa.Column('start_date', sa.Date(), nullable=False),
+    sa.Column('end_date', sa.Date(), nullable=False),
+    sa.PrimaryKeyConstraint('service_id')
+    )
+    op.create_table('calendar_dates',
+    sa.Column('service_id', sa.String(), nullable=False),
+    sa.Column('date', sa.Date(), nullable=False),
+    sa.Column('exception_type', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('service_id', 'date')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('calendar_dates')
+    op.drop_table('calendar')
+    op.drop_index('ix_stop_times_stop_id_arrival_secs', table_name='stop_times')
+    op.drop_column('stop_times', 'departure_secs')
+    op.drop_column('stop_times', 'arrival_secs')
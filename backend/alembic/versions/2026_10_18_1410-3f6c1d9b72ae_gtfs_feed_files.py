@@ -0,0 +1,30 @@
+"""gtfs_feed_files
+
+Revision ID: 3f6c1d9b72ae
+Revises: 960b0e925e6a
+Create Date: 2026-10-18 14:10:37.905113
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f6c1d9b72ae'
+down_revision = '960b0e925e6a'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('gtfs_feed_files',
+    sa.Column('file_name', sa.String(), nullable=False),
+    sa.Column('sha256', sa.String(), nullable=False),
+    sa.Column('row_count', sa.Integer(), nullable=True),
+    sa.Column('loaded_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+    sa.PrimaryKeyConstraint('file_name')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('gtfs_feed_files')
@@ -0,0 +1,50 @@
+"""rt_archive_tables
+
+Revision ID: b83e4f0a6d21
+Revises: 3f6c1d9b72ae
+Create Date: 2026-10-18 17:30:12.408316
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b83e4f0a6d21'
+down_revision = '3f6c1d9b72ae'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Daily partitions are created (and expired) by app.services.rt_archive
+    op.create_table('rt_vehicle_positions',
+    sa.Column('observed_at', sa.DateTime(), nullable=False),
+    sa.Column('vehicle_id', sa.String(), nullable=False),
+    sa.Column('trip_id', sa.String(), nullable=True),
+    sa.Column('route_id', sa.String(), nullable=True),
+    sa.Column('stop_id', sa.String(), nullable=True),
+    sa.Column('lat', sa.Float(), nullable=True),
+    sa.Column('lon', sa.Float(), nullable=True),
+    sa.Column('bearing', sa.Float(), nullable=True),
+    sa.Column('speed', sa.Float(), nullable=True),
+    sa.Column('current_status', sa.Integer(), nullable=True),
+    sa.PrimaryKeyConstraint('observed_at', 'vehicle_id'),
+    postgresql_partition_by='RANGE (observed_at)'
+    )
+    op.create_table('rt_trip_updates_raw',
+    sa.Column('feed_timestamp', sa.DateTime(), nullable=False),
+    sa.Column('trip_id', sa.String(), nullable=False),
+    sa.Column('stop_sequence', sa.Integer(), nullable=False),
+    sa.Column('stop_id', sa.String(), nullable=False),
+    sa.Column('route_id', sa.String(), nullable=True),
+    sa.Column('arrival_delay', sa.Integer(), nullable=True),
+    sa.PrimaryKeyConstraint('feed_timestamp', 'trip_id', 'stop_sequence', 'stop_id'),
+    postgresql_partition_by='RANGE (feed_timestamp)'
+    )
+
+
+def downgrade() -> None:
+    # Dropping a partitioned table drops its partitions
+    op.drop_table('rt_trip_updates_raw')
+    op.drop_table('rt_vehicle_positions')
@@ -1,9 +1,10 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from app.db.session import SessionLocal
-from app.models.gtfs import Stop, Route
-from app.schemas.gtfs import StopSchema, RouteSchema # Need to create schemas
+from app.models.gtfs import Stop
+from app.schemas.gtfs import StopSchema, NearbyStopSchema, RouteSchema
 from geoalchemy2.functions import ST_DWithin, ST_Distance
 from geoalchemy2.elements import WKTElement
 
@@ -11,20 +12,138 @@ router = APIRouter()
 
 import redis
 import json
+import math
 from app.core.config import settings
+from app.api.http_cache import (
+    etag_matches, not_modified, conditional_json, static_etag, realtime_cache_control, STATIC_CACHE_CONTROL
+)
+from app.services.rt_cache import (
+    VEHICLES_VERSION_KEY, VEHICLES_GEO_KEY, vehicles_snapshot_key, vehicle_key, route_vehicles_key,
+    fetch_vehicle_changes, SERVICE_ALERTS_KEY, SERVICE_ALERTS_VERSION_KEY
+)
+from app.services.static_cache import static_gtfs
 
 redis_client = redis.Redis.from_url(settings.REDIS_URL, decode_responses=True)
 
+METERS_PER_DEGREE = 111_320
+
 @router.get("/vehicles")
-def get_vehicles():
-    """Get all active vehicles from Redis."""
-    keys = redis_client.keys("vehicle:*")
-    if not keys:
+def get_vehicles(
+    request: Request,
+    route_id: Optional[str] = None,
+    bbox: Optional[str] = Query(None, description="min_lon,min_lat,max_lon,max_lat"),
+    near: Optional[str] = Query(None, description="lat,lon"),
+    radius_m: float = Query(500, gt=0, le=50000),
+    since: Optional[int] = Query(None, description="Version from a previous response; returns only changes")
+):
+    """
+    Get active vehicles, optionally filtered by route, bounding box or distance.
+    Serves the snapshot / indexes written by the ingest worker, tagged with the
+    feed timestamp so pollers get a 304 until the next feed cycle.
+
+    With ?since=<version> the response is a delta instead of a list:
+    {"version", "full", "vehicles" (added or moved), "removed" (vehicle_ids)}.
+    "full" is true when `since` is too old and "vehicles" is the whole fleet.
+    """
+    version = redis_client.get(VEHICLES_VERSION_KEY)
+    if version is None:
+        return []
+
+    etag = f'"vehicles-{version}"'
+    cache_control = realtime_cache_control(version)
+    if etag_matches(request, etag):
+        return not_modified(etag, cache_control)
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+
+    if since is not None:
+        if route_id or bbox or near:
+            raise HTTPException(status_code=400, detail="since cannot be combined with route_id, bbox or near")
+        return _vehicles_delta(str(since), version, headers)
+
+    if route_id or bbox or near:
+        vehicles = _filtered_vehicles(route_id, _parse_floats(bbox, 4, "bbox"), _parse_floats(near, 2, "near"), radius_m)
+        return JSONResponse(content=vehicles, headers=headers)
+
+    snapshot = redis_client.get(vehicles_snapshot_key(version))
+    if snapshot is None:
         return []
+
+    return Response(content=snapshot, media_type="application/json", headers=headers)
+
+def _vehicles_delta(since: str, version: str, headers: dict) -> Response:
+    if since == version:
+        changes = ([], [])
+    else:
+        changes = fetch_vehicle_changes(redis_client, since)
+
+    if changes is None:
+        # Too old: full snapshot, spliced in without decoding it
+        snapshot = redis_client.get(vehicles_snapshot_key(version)) or "[]"
+        body = f'{{"version":{version},"full":true,"vehicles":{snapshot},"removed":[]}}'
+        return Response(content=body, media_type="application/json", headers=headers)
+
+    changed, removed = changes
+    vehicles = []
+    if changed:
+        vehicles = [json.loads(v) for v in redis_client.mget([vehicle_key(vid) for vid in changed]) if v]
+
+    return JSONResponse(
+        content={"version": int(version), "full": False, "vehicles": vehicles, "removed": removed},
+        headers=headers
+    )
+
+def _parse_floats(value: Optional[str], count: int, name: str):
+    if value is None:
+        return None
+    try:
+        parts = [float(p) for p in value.split(",")]
+    except ValueError:
+        parts = []
+    if len(parts) != count:
+        raise HTTPException(status_code=400, detail=f"{name} must be {count} comma-separated numbers")
+    return parts
+
+def _filtered_vehicles(route_id: Optional[str], bbox: Optional[list], near: Optional[list], radius_m: float) -> list:
+    """Answers filtered queries from the route sets / GEO index instead of the whole fleet."""
+    candidates = None # None = no constraint yet; ordered list once a filter has run
     
-    # MGET is faster than loop
-    vehicles_json = redis_client.mget(keys)
-    vehicles = [json.loads(v) for v in vehicles_json if v]
+    if near:
+        lat, lon = near
+        candidates = redis_client.geosearch(
+            VEHICLES_GEO_KEY, longitude=lon, latitude=lat, radius=radius_m, unit="m", sort="ASC"
+        )
+
+    if bbox:
+        min_lon, min_lat, max_lon, max_lat = bbox
+        if min_lon > max_lon or min_lat > max_lat:
+            raise HTTPException(status_code=400, detail="bbox must be min_lon,min_lat,max_lon,max_lat")
+        # GEOSEARCH BYBOX is centred; the box is widened slightly and trimmed exactly below
+        center_lat = (min_lat + max_lat) / 2
+        # Redis measures each member's longitude offset at the member's own latitude:
+        # size the width at the latitude nearest the equator, where a degree is widest
+        equator_lat = 0.0 if min_lat <= 0 <= max_lat else min(abs(min_lat), abs(max_lat))
+        width_m = (max_lon - min_lon) * METERS_PER_DEGREE * max(math.cos(math.radians(equator_lat)), 0.01)
+        height_m = (max_lat - min_lat) * METERS_PER_DEGREE
+        in_box = redis_client.geosearch(
+            VEHICLES_GEO_KEY, longitude=(min_lon + max_lon) / 2, latitude=center_lat,
+            width=width_m * 1.01 + 1, height=height_m * 1.01 + 1, unit="m"
+        )
+        if candidates is None:
+            candidates = in_box
+        else:
+            in_box = set(in_box)
+            candidates = [vid for vid in candidates if vid in in_box]
+
+    if route_id:
+        on_route = redis_client.smembers(route_vehicles_key(route_id))
+        candidates = sorted(on_route) if candidates is None else [vid for vid in candidates if vid in on_route]
+
+    if not candidates:
+        return []
+
+    vehicles = [json.loads(v) for v in redis_client.mget([vehicle_key(vid) for vid in candidates]) if v]
+    if bbox:
+        vehicles = [v for v in vehicles if min_lon <= v['lon'] <= max_lon and min_lat <= v['lat'] <= max_lat]
     return vehicles
 
 def get_db():
@@ -34,36 +153,66 @@ def get_db():
     finally:
         db.close()
 
+@router.get("/service-alerts")
+def get_service_alerts(request: Request):
+    """Current GTFS-RT service alerts (detours, closures...), as ingested from the Alerts feed."""
+    version, alerts = redis_client.mget([SERVICE_ALERTS_VERSION_KEY, SERVICE_ALERTS_KEY])
+    if version is None or alerts is None:
+        return []
+    return conditional_json(request, f'"alerts-{version}"', realtime_cache_control(version), lambda: alerts)
+
 @router.get("/stops/search", response_model=List[StopSchema])
-def search_stops(q: str, db: Session = Depends(get_db)):
-    """Search stops by name."""
-    return db.query(Stop).filter(Stop.stop_name.ilike(f"%{q}%")).limit(10).all()
+def search_stops(request: Request, q: str = Query(..., min_length=1, max_length=100)):
+    """Search stops by name or code (prefix matches first, then fuzzy matches)."""
+    data, version = static_gtfs.get_versioned()
+    return conditional_json(request, static_etag(version), STATIC_CACHE_CONTROL, lambda: data.stop_search.search(q, limit=10))
+
+@router.get("/stops/nearby", response_model=List[NearbyStopSchema])
+def get_nearby_stops(
+    request: Request,
+    lat: float,
+    lon: float,
+    radius: float = 0.01,
+    radius_m: Optional[float] = Query(None, gt=0, le=5000),
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_db)
+):
+    """
+    Find stops near a point.
+    With radius_m: stops within that many meters, nearest first, with distance_m
+    (answered from the in-process grid index, no DB round trip).
+    Without it: legacy degree-radius query, unordered.
+    """
+    if radius_m is not None:
+        data, version = static_gtfs.get_versioned()
+        return conditional_json(request, static_etag(version), STATIC_CACHE_CONTROL, lambda: [
+            {**stop, 'distance_m': round(distance, 1)}
+            for distance, stop in data.stop_geo.nearby(lat, lon, radius_m, limit)
+        ])
 
-@router.get("/stops/nearby", response_model=List[StopSchema])
-def get_nearby_stops(lat: float, lon: float, radius: float = 0.01, db: Session = Depends(get_db)):
-    """Find stops within radius (approx degrees for now, better use meters with geography)."""
     # Using simple ST_DWithin with geometry (degrees) for simplicity in this MVP
-    # In production, cast to geography or use a projected CRS for meters.
     # 0.01 degrees is roughly 1km.
-    
     point = WKTElement(f'POINT({lon} {lat})', srid=4326)
-    return db.query(Stop).filter(ST_DWithin(Stop.geom, point, radius)).limit(20).all()
+    return db.query(Stop).filter(ST_DWithin(Stop.geom, point, radius)).limit(limit).all()
 
 @router.get("/stops/{stop_id}", response_model=StopSchema)
-def get_stop(stop_id: str, db: Session = Depends(get_db)):
-    stop = db.query(Stop).filter(Stop.stop_id == stop_id).first()
+def get_stop(request: Request, stop_id: str):
+    data, version = static_gtfs.get_versioned()
+    stop = data.stops_by_id.get(stop_id)
     if not stop:
         raise HTTPException(status_code=404, detail="Stop not found")
-    return stop
+    return conditional_json(request, static_etag(version), STATIC_CACHE_CONTROL, lambda: stop)
 
 @router.get("/routes", response_model=List[RouteSchema])
-def get_routes(db: Session = Depends(get_db)):
+def get_routes(request: Request):
     """List all routes."""
-    return db.query(Route).all()
+    data, version = static_gtfs.get_versioned()
+    return conditional_json(request, static_etag(version), STATIC_CACHE_CONTROL, lambda: data.routes_json)
 
 @router.get("/routes/{route_id}", response_model=RouteSchema)
-def get_route(route_id: str, db: Session = Depends(get_db)):
-    route = db.query(Route).filter(Route.route_id == route_id).first()
+def get_route(request: Request, route_id: str):
+    data, version = static_gtfs.get_versioned()
+    route = data.routes_by_id.get(route_id)
     if not route:
         raise HTTPException(status_code=404, detail="Route not found")
-    return route
+    return conditional_json(request, static_etag(version), STATIC_CACHE_CONTROL, lambda: route)
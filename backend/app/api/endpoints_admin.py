@@ -3,8 +3,10 @@ from sqlalchemy.orm import Session
 from app.db.session import SessionLocal
 from app.models.gtfs import Stop, Route, Trip
 from app.models.alerts import AlertSubscription, NotificationEvent
-from app.services.gtfs_rt import parse_vehicle_positions, fetch_feed, VEHICLE_POSITIONS_URL
+from app.services.gtfs_rt import RT_FEEDS
+from app.services.rt_cache import fetch_feed_stats, fetch_feed_health, VEHICLES_GEO_KEY
 import redis
+import time
 from app.core.config import settings
 
 router = APIRouter()
@@ -49,16 +51,26 @@ def get_metrics(db: Session = Depends(get_db)):
     sub_count = db.query(AlertSubscription).count()
     alert_count = db.query(NotificationEvent).count()
     
-    # Live vehicles (from Redis cache or fetch fresh)
-    # We can estimate from fetching feed or counting keys?
-    # Fetching feed is easier for "right now" accuracy without scanning keys
+    # Live vehicles (with a position fix): size of the GEO index rebuilt by every ingest cycle
     vehicles_live = 0
     try:
-        feed = fetch_feed(VEHICLE_POSITIONS_URL)
-        vehicles = parse_vehicle_positions(feed)
-        vehicles_live = len(vehicles)
-    except:
-        pass
+        vehicles_live = redis_client.zcard(VEHICLES_GEO_KEY)
+    except Exception as e:
+        print(f"Error reading live vehicles: {e}")
+
+    # Poll outcomes per GTFS-RT feed (processed vs skipped as unchanged / 304)
+    feed_polls = {}
+    try:
+        feed_polls = fetch_feed_stats(redis_client, list(RT_FEEDS))
+    except Exception as e:
+        print(f"Error reading feed stats: {e}")
+
+    # Ingest daemon schedule per feed, and how far behind the upstream publisher we are
+    feed_health = {}
+    try:
+        feed_health = fetch_feed_health(redis_client, list(RT_FEEDS), time.time())
+    except Exception as e:
+        print(f"Error reading feed health: {e}")
         
     return {
         "counts": {
@@ -71,6 +83,8 @@ def get_metrics(db: Session = Depends(get_db)):
             "alerts_triggered": alert_count
         },
         "realtime": {
-            "active_vehicles": vehicles_live
+            "active_vehicles": vehicles_live,
+            "feed_polls": feed_polls,
+            "feed_health": feed_health
         }
     }
@@ -1,77 +1,73 @@
 from .endpoints import router, get_db
 from app.api import endpoints
-import datetime
-from fastapi import Depends, HTTPException
+import hashlib
+import json
+import time
+from typing import Dict, List
+from fastapi import Depends, HTTPException, Query, Request
 from sqlalchemy.orm import Session
 from app.schemas.gtfs import ArrivalSchema
-from app.models.gtfs import StopTime, Trip
-from app.services.gtfs_rt import parse_trip_updates
-from app.services.prediction import prediction_service
+from app.services.arrivals import build_stop_arrivals, build_arrivals_for_stops, DEFAULT_WINDOW_MINUTES, DEFAULT_LIMIT
+from app.api.http_cache import conditional_json, realtime_cache_control
+from app.services.rt_cache import arrival_board_key, TRIP_UPDATES_VERSION_KEY
+from app.services.schedule import agency_now
 import redis
-import json
 from app.core.config import settings
 
 redis_client = redis.Redis.from_url(settings.REDIS_URL, decode_responses=True)
 
+MAX_BATCH_STOPS = 100
+
+def _arrivals_etag(tu_version, stop_ids, window_minutes: int, limit: int) -> str:
+    # Boards change with every trip-updates ingest and as the window slides (minute granularity)
+    key = f"{tu_version}-{int(time.time() // 60)}-{window_minutes}-{limit}-{','.join(stop_ids)}"
+    return f'"arrivals-{hashlib.sha1(key.encode()).hexdigest()[:16]}"'
+
 @endpoints.router.get("/stops/{stop_id}/arrivals", response_model=list[ArrivalSchema])
-def get_stop_arrivals(stop_id: str, db: Session = Depends(get_db)):
+def get_stop_arrivals(request: Request, stop_id: str, window_minutes: int = Query(DEFAULT_WINDOW_MINUTES, ge=1, le=720), limit: int = Query(DEFAULT_LIMIT, ge=1, le=200), db: Session = Depends(get_db)):
     """
     Get upcoming arrivals for a stop.
-    Merges Static Schedule with Real-time Trip Updates + ML Predictions.
+    Serves the board precomputed by the ingest worker when there is one,
+    otherwise merges Static Schedule with Real-time Trip Updates + ML Predictions live.
+    """
+    tu_version, board = redis_client.mget([TRIP_UPDATES_VERSION_KEY, arrival_board_key(stop_id)])
+    etag = _arrivals_etag(tu_version, [stop_id], window_minutes, limit)
+
+    def body():
+        # Boards are materialized with the default window/limit only
+        if board and window_minutes == DEFAULT_WINDOW_MINUTES and limit == DEFAULT_LIMIT:
+            return board
+        arrivals = build_stop_arrivals(db, redis_client, stop_id, agency_now(), window_minutes, limit)
+        return [a.model_dump() for a in arrivals]
+
+    return conditional_json(request, etag, realtime_cache_control(tu_version), body)
+
+@endpoints.router.get("/arrivals", response_model=Dict[str, List[ArrivalSchema]])
+def get_arrivals_batch(request: Request, stop_id: List[str] = Query(...), window_minutes: int = Query(DEFAULT_WINDOW_MINUTES, ge=1, le=720), limit: int = Query(DEFAULT_LIMIT, ge=1, le=200), db: Session = Depends(get_db)):
+    """
+    Upcoming arrivals for several stops at once (?stop_id=A&stop_id=B...).
+    Returns {stop_id: [arrivals]}. Stored boards are read with one MGET;
+    the remaining stops share one SQL query, one Redis pipeline and one prediction pass.
     """
-    # 1. Get Scheduled Arrivals for next 60 mins (Simplified to limit 50 limit)
-    stop_times = db.query(StopTime).filter(StopTime.stop_id == stop_id).join(Trip).limit(50).all()
-    
-    arrivals = []
-    
-    for st in stop_times:
-        trip_id = st.trip_id
-        route_id = st.trip.route_id
-        
-        # Redis Key: trip_update:{trip_id}
-        tu_data = redis_client.get(f"trip_update:{trip_id}")
-        
-        pred_arrival = None
-        delay = 0.0
-        status = "SCHEDULED"
-        prob_late = 0.0
-        
-        if tu_data:
-            tu = json.loads(tu_data)
-            # Find update for this stop sequence
-            for update in tu['stop_time_updates']:
-                if update['stop_sequence'] == st.stop_sequence:
-                    if update.get('arrival_delay'):
-                         delay = float(update['arrival_delay'] / 60.0) # minutes
-                         status = "LATE" if delay > 5 else "ON_TIME"
-                         if delay < -1: status = "EARLY"
-                         break
-        
-        # ML Prediction Section
-        # Build features for specific trip/stop
-        features = {
-            'route_id': route_id,
-            'stop_sequence': st.stop_sequence,
-            # Simple heuristic for time features since we don't have parsed 'arrival_time' handy as datetime
-            # In real app, we convert st.arrival_time (string) to datetime
-            'hour_of_day': 12, # Placeholder
-            'day_of_week': 2, # Placeholder
-            'is_weekend': 0
-        }
-        
-        prediction = prediction_service.predict(features)
-        prob_late = prediction['probability_late_5min']
-        
-        arrivals.append(ArrivalSchema(
-            trip_id=trip_id,
-            route_id=route_id,
-            headsign=st.trip.trip_headsign,
-            scheduled_arrival=st.arrival_time,
-            predicted_arrival=None, 
-            delay_minutes=delay,
-            status=status,
-            probability_late_5min=prob_late,
-            vehicle_id=None
-        ))
-        
-    return arrivals
+    stop_ids = list(dict.fromkeys(stop_id)) # de-dupe, keep order
+    if len(stop_ids) > MAX_BATCH_STOPS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_STOPS} stop_ids per request")
+
+    tu_version, *stored = redis_client.mget([TRIP_UPDATES_VERSION_KEY] + [arrival_board_key(sid) for sid in stop_ids])
+    etag = _arrivals_etag(tu_version, stop_ids, window_minutes, limit)
+
+    def body():
+        boards = {}
+        if window_minutes == DEFAULT_WINDOW_MINUTES and limit == DEFAULT_LIMIT:
+            boards = {sid: board for sid, board in zip(stop_ids, stored) if board}
+
+        missing = [sid for sid in stop_ids if sid not in boards]
+        if missing:
+            computed = build_arrivals_for_stops(db, redis_client, missing, agency_now(), window_minutes, limit)
+            for sid, arrivals in computed.items():
+                boards[sid] = json.dumps([a.model_dump() for a in arrivals])
+
+        # Stitch the pre-serialized boards together instead of re-validating them
+        return "{" + ",".join(f"{json.dumps(sid)}:{boards[sid]}" for sid in stop_ids) + "}"
+
+    return conditional_json(request, etag, realtime_cache_control(tu_version), body)
@@ -0,0 +1,66 @@
+"""
+HTTP caching helpers: ETag / If-None-Match revalidation and Cache-Control policies.
+
+- Static GTFS responses are tagged with the loaded static feed version and may be
+  cached by browsers / CDNs for a few minutes, then revalidated.
+- Real-time responses are tagged with the feed timestamp of the last ingest and
+  cached only until the next ingest is due.
+"""
+import json
+import time
+from typing import Optional
+from fastapi import Request, Response
+
+STATIC_CACHE_CONTROL = "public, max-age=300, stale-while-revalidate=3600"
+UNVERSIONED_CACHE_CONTROL = "no-cache"
+REALTIME_POLL_SECONDS = 10 # Ingest cadence of the GTFS-RT feeds
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """True if the client's If-None-Match already names this ETag."""
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # Weak comparison: W/"x" and "x" are the same entity for GET revalidation
+    candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return etag.removeprefix("W/") in candidates
+
+def not_modified(etag: str, cache_control: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": cache_control})
+
+def static_etag(static_version: Optional[str], *parts) -> Optional[str]:
+    """ETag for a static-GTFS response; None until a loader run has published a version."""
+    if static_version is None:
+        return None
+    return '"' + "-".join(["gtfs", static_version, *map(str, parts)]) + '"'
+
+def realtime_cache_control(feed_timestamp) -> str:
+    """Cacheable until the next ingest is due, judged from the last feed timestamp."""
+    try:
+        age = time.time() - int(feed_timestamp)
+    except (TypeError, ValueError):
+        return UNVERSIONED_CACHE_CONTROL
+    max_age = int(min(max(REALTIME_POLL_SECONDS - age, 1), REALTIME_POLL_SECONDS))
+    return f"public, max-age={max_age}"
+
+def conditional_json(request: Request, etag: Optional[str], cache_control: str, make_body) -> Response:
+    """
+    Answers with 304 when the client already has `etag`; otherwise calls
+    make_body() (a JSON string, or anything json.dumps accepts) and sends it
+    with the ETag and Cache-Control headers. Skipping the response_model
+    re-validation is intentional: bodies come from already-validated data.
+    """
+    if etag is None:
+        cache_control = UNVERSIONED_CACHE_CONTROL
+    elif etag_matches(request, etag):
+        return not_modified(etag, cache_control)
+
+    body = make_body()
+    if not isinstance(body, (str, bytes)):
+        body = json.dumps(body)
+
+    headers = {"Cache-Control": cache_control}
+    if etag is not None:
+        headers["ETag"] = etag
+    return Response(content=body, media_type="application/json", headers=headers)
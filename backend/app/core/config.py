@@ -4,6 +4,15 @@ class Settings(BaseSettings):
     PROJECT_NAME: str = "Smart Public Transport Delay Predictor"
     DATABASE_URL: str
     REDIS_URL: str
+    # Agency timezone (GTFS agency_timezone); service days start at local midnight
+    AGENCY_TIMEZONE: str = "America/Chicago"
+    # Static GTFS zip and the directory the loader keeps its last download in
+    GTFS_STATIC_URL: str = "https://rideconnecttransit.com/gtfs"
+    GTFS_CACHE_DIR: str = "data/gtfs"
+    # Days of real-time history kept in the rt_* archive tables
+    RT_ARCHIVE_RETENTION_DAYS: int = 180
+    # Root of the GTFS-RT Parquet snapshot datasets written by the ingest daemon; empty = off
+    RT_PARQUET_DIR: str = ""
 
     class Config:
         env_file = ".env"
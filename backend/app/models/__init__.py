@@ -1,2 +1,3 @@
-from .gtfs import Stop, Route, Trip, StopTime
+from .gtfs import Stop, Route, Trip, StopTime, ServiceCalendar, CalendarDate, FeedFile
 from .alerts import AlertSubscription, NotificationEvent
+from .realtime import VehiclePositionObservation, TripUpdateObservation
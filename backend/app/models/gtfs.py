@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, Date, DateTime, Index
+from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from geoalchemy2 import Geometry
 from app.db.session import Base
@@ -40,6 +41,41 @@ class StopTime(Base):
     stop_sequence = Column(Integer, primary_key=True)
     arrival_time = Column(String, nullable=True) # Text in GTFS (HH:MM:SS)
     departure_time = Column(String, nullable=True)
+    # Seconds since service-day midnight (can exceed 86400 for trips past 24:00)
+    arrival_secs = Column(Integer, nullable=True)
+    departure_secs = Column(Integer, nullable=True)
     
     trip = relationship("Trip")
     stop = relationship("Stop")
+
+    __table_args__ = (
+        # Backs the "next N minutes at stop X" arrivals query
+        Index('ix_stop_times_stop_id_arrival_secs', 'stop_id', 'arrival_secs'),
+    )
+
+class ServiceCalendar(Base):
+    __tablename__ = "calendar"
+    service_id = Column(String, primary_key=True)
+    monday = Column(Integer, nullable=False)
+    tuesday = Column(Integer, nullable=False)
+    wednesday = Column(Integer, nullable=False)
+    thursday = Column(Integer, nullable=False)
+    friday = Column(Integer, nullable=False)
+    saturday = Column(Integer, nullable=False)
+    sunday = Column(Integer, nullable=False)
+    start_date = Column(Date, nullable=False)
+    end_date = Column(Date, nullable=False)
+
+class CalendarDate(Base):
+    __tablename__ = "calendar_dates"
+    service_id = Column(String, primary_key=True)
+    date = Column(Date, primary_key=True)
+    exception_type = Column(Integer, nullable=False) # 1 = service added, 2 = service removed
+
+class FeedFile(Base):
+    """Content hash of each static GTFS file as last loaded; lets reloads skip unchanged files."""
+    __tablename__ = "gtfs_feed_files"
+    file_name = Column(String, primary_key=True) # e.g. "stop_times.txt"
+    sha256 = Column(String, nullable=False)
+    row_count = Column(Integer, nullable=True)
+    loaded_at = Column(DateTime, server_default=func.now(), nullable=False)
@@ -0,0 +1,32 @@
+from sqlalchemy import Column, Integer, String, Float, DateTime
+from app.db.session import Base
+
+# Archive of real-time observations, written by app.services.rt_archive.
+# Both tables are partitioned by UTC day; the partitions are managed by the archiver.
+
+class VehiclePositionObservation(Base):
+    __tablename__ = "rt_vehicle_positions"
+    __table_args__ = {'postgresql_partition_by': 'RANGE (observed_at)'}
+
+    observed_at = Column(DateTime, primary_key=True) # UTC; vehicle timestamp, else feed timestamp
+    vehicle_id = Column(String, primary_key=True)
+    trip_id = Column(String, nullable=True)
+    route_id = Column(String, nullable=True)
+    stop_id = Column(String, nullable=True)
+    lat = Column(Float, nullable=True)
+    lon = Column(Float, nullable=True)
+    bearing = Column(Float, nullable=True)
+    speed = Column(Float, nullable=True)
+    current_status = Column(Integer, nullable=True)
+
+class TripUpdateObservation(Base):
+    """One stop_time_update of a trip update, as of one feed version."""
+    __tablename__ = "rt_trip_updates_raw"
+    __table_args__ = {'postgresql_partition_by': 'RANGE (feed_timestamp)'}
+
+    feed_timestamp = Column(DateTime, primary_key=True) # UTC FeedHeader timestamp
+    trip_id = Column(String, primary_key=True)
+    stop_sequence = Column(Integer, primary_key=True) # 0 when the update only names a stop_id
+    stop_id = Column(String, primary_key=True) # "" when it only names a stop_sequence
+    route_id = Column(String, nullable=True)
+    arrival_delay = Column(Integer, nullable=True) # seconds
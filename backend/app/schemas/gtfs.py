@@ -14,6 +14,9 @@ class StopSchema(StopBase):
     class Config:
         from_attributes = True
 
+class NearbyStopSchema(StopSchema):
+    distance_m: Optional[float] = None # Set when searching by radius_m
+
 class RouteBase(BaseModel):
     route_id: str
     route_short_name: Optional[str]
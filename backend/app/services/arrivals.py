@@ -0,0 +1,75 @@
+import datetime
+from sqlalchemy.orm import Session
+from app.schemas.gtfs import ArrivalSchema
+from app.services.prediction import prediction_service
+from app.services.rt_cache import fetch_arrival_delays
+from app.services.schedule import upcoming_stop_times_for_stops, time_features
+
+DEFAULT_WINDOW_MINUTES = 60
+DEFAULT_LIMIT = 50
+
+def build_stop_arrivals(db: Session, redis_client, stop_id: str, now: datetime.datetime,
+                        window_minutes: int = DEFAULT_WINDOW_MINUTES, limit: int = DEFAULT_LIMIT) -> list:
+    """
+    Upcoming arrivals for a stop.
+    Used live by the API and by the ingest worker to materialize arrival boards.
+    """
+    return build_arrivals_for_stops(db, redis_client, [stop_id], now, window_minutes, limit)[stop_id]
+
+def build_arrivals_for_stops(db: Session, redis_client, stop_ids: list, now: datetime.datetime,
+                             window_minutes: int = DEFAULT_WINDOW_MINUTES, limit: int = DEFAULT_LIMIT) -> dict:
+    """
+    Upcoming arrivals for many stops: {stop_id: [ArrivalSchema, ...]}.
+    Merges Static Schedule with Real-time Trip Updates + ML Predictions using
+    one SQL query, one Redis pipeline and one prediction pass for all stops.
+    """
+    # 1. Scheduled arrivals in the next `window_minutes` for services running today
+    upcoming_by_stop = upcoming_stop_times_for_stops(db, stop_ids, now, window_minutes, limit)
+    upcoming = [
+        (stop_id, st, service_date)
+        for stop_id, rows in upcoming_by_stop.items()
+        for st, service_date in rows
+    ]
+
+    # 2. Real-time delays for every row in one Redis round trip
+    delays_sec = fetch_arrival_delays(redis_client, [(st.trip_id, st.stop_sequence) for _, st, _ in upcoming])
+
+    rows = []
+    features_list = []
+
+    for (stop_id, st, service_date), delay_sec in zip(upcoming, delays_sec):
+        delay = 0.0
+        status = "SCHEDULED"
+
+        if delay_sec:
+            delay = float(delay_sec / 60.0) # minutes
+            status = "LATE" if delay > 5 else "ON_TIME"
+            if delay < -1: status = "EARLY"
+
+        # ML Prediction Section
+        # Build features for specific trip/stop
+        features_list.append({
+            'route_id': st.trip.route_id,
+            'stop_sequence': st.stop_sequence,
+            **time_features(service_date, st.arrival_secs)
+        })
+        rows.append((stop_id, st, delay, status))
+
+    # 3. Score every candidate arrival in one pass instead of one pipeline run per row
+    predictions = prediction_service.predict_many(features_list)
+
+    arrivals = {stop_id: [] for stop_id in upcoming_by_stop}
+    for (stop_id, st, delay, status), prediction in zip(rows, predictions):
+        arrivals[stop_id].append(ArrivalSchema(
+            trip_id=st.trip_id,
+            route_id=st.trip.route_id,
+            headsign=st.trip.trip_headsign,
+            scheduled_arrival=st.arrival_time,
+            predicted_arrival=None,
+            delay_minutes=delay,
+            status=status,
+            probability_late_5min=prediction['probability_late_5min'],
+            vehicle_id=None
+        ))
+
+    return arrivals
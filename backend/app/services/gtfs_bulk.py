@@ -0,0 +1,162 @@
+"""
+Fast path for bulk-loading GTFS tables with Postgres COPY.
+
+Each GTFS file is read in bounded chunks, shaped into the target table's columns
+with vectorized pandas (no per-row Python objects) and streamed into a temporary
+staging table with `COPY ... FROM STDIN`, one chunk at a time. The staging table
+is then merged into the real table with one INSERT ... SELECT ... ON CONFLICT,
+so reloading a feed updates rows in place and memory stays flat with feed size.
+
+For differential reloads the staging table doubles as the shadow copy of the new
+file: after the upsert, rows missing from it are deleted from the live table in
+the same transaction, so readers switch from the old schedule to the new one
+at commit and never see a half-loaded table.
+"""
+import io
+import pandas as pd
+
+# Target columns per table, in COPY order. stops.geom is derived during the merge.
+TABLE_COLUMNS = {
+    'routes': ['route_id', 'route_short_name', 'route_long_name', 'route_type', 'route_color', 'route_text_color'],
+    'stops': ['stop_id', 'stop_code', 'stop_name', 'stop_desc', 'stop_lat', 'stop_lon'],
+    'calendar': ['service_id', 'monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday', 'start_date', 'end_date'],
+    'calendar_dates': ['service_id', 'date', 'exception_type'],
+    'trips': ['trip_id', 'route_id', 'service_id', 'trip_headsign', 'direction_id', 'shape_id'],
+    'stop_times': ['trip_id', 'stop_id', 'stop_sequence', 'arrival_time', 'departure_time', 'arrival_secs', 'departure_secs'],
+}
+
+PRIMARY_KEYS = {
+    'routes': ['route_id'],
+    'stops': ['stop_id'],
+    'calendar': ['service_id'],
+    'calendar_dates': ['service_id', 'date'],
+    'trips': ['trip_id'],
+    'stop_times': ['trip_id', 'stop_id', 'stop_sequence'],
+}
+
+# Columns to keep as text when reading the CSVs (IDs like "007" must not become 7)
+TEXT_COLUMNS = {
+    'route_id', 'stop_id', 'trip_id', 'service_id', 'shape_id', 'stop_code',
+    'route_color', 'route_text_color', 'arrival_time', 'departure_time',
+    'route_short_name', 'route_long_name', 'stop_name', 'stop_desc', 'trip_headsign',
+}
+
+INT_COLUMNS = {
+    'route_type', 'direction_id', 'stop_sequence', 'arrival_secs', 'departure_secs', 'exception_type',
+    'monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday',
+}
+
+DATE_COLUMNS = {'start_date', 'end_date', 'date'}
+
+# Rows a prune must keep while something still points at them (child table, FK column).
+# Covers user data (alert subscriptions) and children whose own file did not change.
+KEEP_IF_REFERENCED = {
+    'routes': [('trips', 'route_id'), ('alert_subscriptions', 'route_id')],
+    'stops': [('stop_times', 'stop_id'), ('alert_subscriptions', 'stop_id')],
+    'trips': [('stop_times', 'trip_id')],
+}
+
+# Derived during prepare_frame(), never read from the feed
+DERIVED_COLUMNS = {'arrival_secs', 'departure_secs'}
+
+def source_columns(table: str) -> set:
+    """GTFS columns read for `table`; anything else in the file is skipped at parse time."""
+    return set(TABLE_COLUMNS[table]) - DERIVED_COLUMNS
+
+def gtfs_times_to_seconds(times: pd.Series) -> pd.Series:
+    """Vectorized gtfs_time_to_seconds(): 'HH:MM:SS' -> seconds (nullable Int64)."""
+    parts = times.astype("string").str.strip().str.extract(r"^(\d+):(\d{2}):(\d{2})$")
+    parts = parts.apply(pd.to_numeric)
+    return (parts[0] * 3600 + parts[1] * 60 + parts[2]).astype("Int64")
+
+def prepare_frame(table: str, df: pd.DataFrame) -> pd.DataFrame:
+    """Shapes a raw GTFS DataFrame into `table`'s COPY columns."""
+    if table == 'stop_times':
+        df = df.assign(
+            arrival_secs=gtfs_times_to_seconds(df['arrival_time']) if 'arrival_time' in df else pd.NA,
+            departure_secs=gtfs_times_to_seconds(df['departure_time']) if 'departure_time' in df else pd.NA,
+        )
+
+    out = pd.DataFrame(index=df.index)
+    for col in TABLE_COLUMNS[table]:
+        values = df[col] if col in df else pd.Series(pd.NA, index=df.index)
+        if col in INT_COLUMNS:
+            values = pd.to_numeric(values, errors="coerce").astype("Int64")
+        elif col in DATE_COLUMNS:
+            values = pd.to_datetime(values.astype("string"), format="%Y%m%d", errors="coerce").dt.strftime("%Y-%m-%d")
+        elif col in TEXT_COLUMNS:
+            values = values.astype("string")
+        out[col] = values
+    return out
+
+def copy_frame(cursor, table: str, df: pd.DataFrame):
+    """Streams a prepared frame into `table` with COPY FROM STDIN (empty fields -> NULL)."""
+    buf = io.StringIO()
+    df.to_csv(buf, header=False, index=False)
+    buf.seek(0)
+    columns = ", ".join(df.columns)
+    cursor.copy_expert(f"COPY {table} ({columns}) FROM STDIN WITH (FORMAT csv)", buf)
+
+def create_staging_table(cursor, table: str, unlogged: bool = False) -> str:
+    """
+    Session-private TEMP table by default; unlogged=True makes a regular UNLOGGED
+    table instead, visible to the parallel loader's worker connections.
+    """
+    staging = f"staging_{table}"
+    cursor.execute(f"DROP TABLE IF EXISTS {staging}")
+    kind = "UNLOGGED TABLE" if unlogged else "TEMP TABLE"
+    cursor.execute(f"CREATE {kind} {staging} (LIKE {table} INCLUDING DEFAULTS)")
+    return staging
+
+def merge_staging_table(cursor, table: str, staging: str) -> int:
+    """Upserts staging rows into `table`. Returns the number of rows inserted or changed."""
+    columns = TABLE_COLUMNS[table]
+    keys = PRIMARY_KEYS[table]
+    select = ", ".join(columns)
+    insert_columns = columns
+
+    if table == 'stops':
+        # Create Point geometry: SRID 4326 is WGS84
+        insert_columns = columns + ['geom']
+        select += ", ST_SetSRID(ST_MakePoint(stop_lon, stop_lat), 4326)"
+
+    updated = [c for c in insert_columns if c not in keys]
+    if updated:
+        # Skip rewriting identical rows: a reload then only touches what the feed changed
+        sets = ", ".join(f"{c} = EXCLUDED.{c}" for c in updated)
+        old_values = ", ".join(f"t.{c}" for c in updated)
+        new_values = ", ".join(f"EXCLUDED.{c}" for c in updated)
+        conflict = f"DO UPDATE SET {sets} WHERE ({old_values}) IS DISTINCT FROM ({new_values})"
+    else:
+        conflict = "DO NOTHING"
+    cursor.execute(
+        f"INSERT INTO {table} AS t ({', '.join(insert_columns)}) "
+        f"SELECT DISTINCT ON ({', '.join(keys)}) {select} FROM {staging} "
+        f"ON CONFLICT ({', '.join(keys)}) {conflict}"
+    )
+    return cursor.rowcount
+
+def delete_missing_rows(cursor, table: str, staging: str) -> int:
+    """Deletes rows of `table` whose key is absent from `staging`. Returns the number deleted."""
+    keys = PRIMARY_KEYS[table]
+    match = " AND ".join(f"s.{k} = t.{k}" for k in keys)
+    conditions = [f"NOT EXISTS (SELECT 1 FROM {staging} s WHERE {match})"]
+    for child, column in KEEP_IF_REFERENCED.get(table, []):
+        conditions.append(f"NOT EXISTS (SELECT 1 FROM {child} c WHERE c.{column} = t.{keys[0]})")
+    cursor.execute(f"DELETE FROM {table} t WHERE {' AND '.join(conditions)}")
+    return cursor.rowcount
+
+def stage_chunks(cursor, table: str, chunks) -> tuple:
+    """
+    COPY an iterable of raw GTFS DataFrames into a fresh staging table for `table`.
+    Each chunk is written before the next is read, so only one is held at a time.
+    Returns (staging table name, rows copied).
+    """
+    staging = create_staging_table(cursor, table)
+    rows = 0
+    for chunk in chunks:
+        copy_frame(cursor, staging, prepare_frame(table, chunk))
+        rows += len(chunk)
+    # Temp tables are never auto-analyzed; give the merge / prune planner real row counts
+    cursor.execute(f"ANALYZE {staging}")
+    return staging, rows
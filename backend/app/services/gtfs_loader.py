@@ -1,46 +1,268 @@
 import os
+import argparse
+import datetime
+import hashlib
+import json
+import resource
 import zipfile
 import pandas as pd
 import requests
-from io import BytesIO
+import redis
 from sqlalchemy.orm import Session
 from app.db.session import SessionLocal, engine
-from app.models.gtfs import Stop, Route, Trip, StopTime, Base
+from app.models.gtfs import Stop, Route, Trip, StopTime, ServiceCalendar, CalendarDate, Base
+from app.services.schedule import gtfs_time_to_seconds
+from app.services.service_calendar import WEEKDAY_COLUMNS
+from app.services.static_feed import bump_static_version
+from app.services.gtfs_bulk import stage_chunks, merge_staging_table, delete_missing_rows, source_columns
+from app.services.gtfs_parallel import stage_parallel
+from app.core.config import settings
 
-GTFS_URL = "https://rideconnecttransit.com/gtfs"
+GTFS_URL = settings.GTFS_STATIC_URL
+FEED_ZIP_NAME = "gtfs.zip"
 
-def download_gtfs():
-    print(f"Downloading GTFS from {GTFS_URL}...")
-    response = requests.get(GTFS_URL)
-    response.raise_for_status()
-    return BytesIO(response.content)
+def parse_gtfs_date(value) -> datetime.date:
+    """GTFS dates are YYYYMMDD (read by pandas as int or str)."""
+    return datetime.datetime.strptime(str(value).strip(), "%Y%m%d").date()
 
-def load_gtfs_static():
+def feed_cache_paths():
+    """(zip path, validators sidecar path) of the cached feed download."""
+    zip_path = os.path.join(settings.GTFS_CACHE_DIR, FEED_ZIP_NAME)
+    return zip_path, zip_path + ".json"
+
+def download_gtfs(url: str = GTFS_URL, conditional: bool = True):
+    """
+    Streams the feed to GTFS_CACHE_DIR, revalidating the cached copy with
+    If-None-Match / If-Modified-Since. Returns (zip path, validators), or
+    (None, None) when the server answers 304 and there is nothing new to load.
+    Validators are only persisted by save_feed_validators() after a successful
+    load, so a failed load is retried on the next run rather than 304'd away.
+    """
+    zip_path, meta_path = feed_cache_paths()
+    os.makedirs(settings.GTFS_CACHE_DIR, exist_ok=True)
+
+    headers = {}
+    if conditional and os.path.exists(zip_path) and os.path.exists(meta_path):
+        with open(meta_path) as f:
+            validators = json.load(f)
+        if validators.get('etag'):
+            headers['If-None-Match'] = validators['etag']
+        if validators.get('last_modified'):
+            headers['If-Modified-Since'] = validators['last_modified']
+
+    print(f"Downloading GTFS from {url}...")
+    with requests.get(url, headers=headers, stream=True, timeout=(10, 300)) as response:
+        if response.status_code == 304:
+            print("GTFS feed not modified since the last load")
+            return None, None
+        response.raise_for_status()
+
+        part_path = zip_path + ".part"
+        with open(part_path, "wb") as f:
+            for block in response.iter_content(chunk_size=1 << 20):
+                f.write(block)
+        validators = {
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+        }
+
+    os.replace(part_path, zip_path)
+    return zip_path, validators
+
+def save_feed_validators(validators: dict):
+    _, meta_path = feed_cache_paths()
+    with open(meta_path, "w") as f:
+        json.dump(validators, f)
+
+# Files loaded by the COPY path, in foreign-key order
+COPY_LOAD_ORDER = [
+    ('routes.txt', 'routes'),
+    ('stops.txt', 'stops'),
+    ('calendar.txt', 'calendar'),
+    ('calendar_dates.txt', 'calendar_dates'),
+    ('trips.txt', 'trips'),
+    ('stop_times.txt', 'stop_times'),
+]
+# calendar.txt / calendar_dates.txt are each optional, but at least one is present in a valid feed
+OPTIONAL_FILES = {'calendar.txt', 'calendar_dates.txt'}
+# Rows parsed per chunk by the COPY path; bounds loader memory independent of feed size
+CHUNK_ROWS = 100_000
+
+def read_gtfs_chunks(z: zipfile.ZipFile, file_name: str, table: str):
+    """Streams a zip member as DataFrames of at most CHUNK_ROWS rows, only the columns `table` needs."""
+    wanted = source_columns(table)
+    with z.open(file_name) as f:
+        # utf-8-sig: some agencies ship a BOM that would otherwise corrupt the first header
+        reader = pd.read_csv(
+            f, dtype=str, encoding="utf-8-sig", chunksize=CHUNK_ROWS,
+            usecols=lambda col: col.strip() in wanted,
+        )
+        for chunk in reader:
+            chunk.columns = chunk.columns.str.strip()
+            yield chunk
+
+def file_sha256(z: zipfile.ZipFile, file_name: str) -> str:
+    digest = hashlib.sha256()
+    with z.open(file_name) as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def loaded_file_hashes(cursor) -> dict:
+    cursor.execute("SELECT file_name, sha256 FROM gtfs_feed_files")
+    return dict(cursor.fetchall())
+
+def record_file_hash(cursor, file_name: str, sha256, row_count: int):
+    """Upserts the hash of a loaded file; sha256=None forgets a file the feed no longer ships."""
+    if sha256 is None:
+        cursor.execute("DELETE FROM gtfs_feed_files WHERE file_name = %s", (file_name,))
+        return
+    cursor.execute(
+        "INSERT INTO gtfs_feed_files (file_name, sha256, row_count, loaded_at) VALUES (%s, %s, %s, now()) "
+        "ON CONFLICT (file_name) DO UPDATE SET sha256 = EXCLUDED.sha256, row_count = EXCLUDED.row_count, loaded_at = now()",
+        (file_name, sha256, row_count),
+    )
+
+def peak_memory_mb() -> float:
+    """Peak resident set size of this process (ru_maxrss is KiB on Linux)."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def load_gtfs_static(gtfs_zip=None, method: str = "copy", full: bool = False, url: str = GTFS_URL, workers: int = 1):
+    """
+    Loads the static GTFS feed from `gtfs_zip` (a local path or file object), or
+    downloads it from `url` when not given, skipping the load if the server says
+    it is unchanged.
+    method="copy" streams files through Postgres COPY in bounded chunks (fast path)
+    and, unless `full`, only reloads files whose content hash changed since the last load;
+    method="orm" is the original row-by-row ORM path, kept for comparison.
+    `workers` > 1 parses and stages the COPY path's files on that many processes.
+    """
     print("Initializing DB tables...")
     Base.metadata.create_all(bind=engine)
     
-    gtfs_zip = download_gtfs()
+    validators = None
+    if gtfs_zip is None:
+        gtfs_zip, validators = download_gtfs(url, conditional=not full)
+        if gtfs_zip is None:
+            return True
     
     with zipfile.ZipFile(gtfs_zip) as z:
-        print("Loading routes...")
-        with z.open("routes.txt") as f:
-            routes_df = pd.read_csv(f)
-            routes_df = routes_df.fillna("")
-            
-        print("Loading stops...")
-        with z.open("stops.txt") as f:
-            stops_df = pd.read_csv(f)
-            stops_df = stops_df.fillna("")
+        if method == "copy":
+            changed = load_with_copy(z, full=full, workers=workers)
+        elif method == "orm":
+            changed = [name for name in z.namelist() if name.endswith(".txt")] if load_with_orm(z) else None
+        else:
+            raise ValueError(f"Unknown load method: {method}")
 
-        print("Loading trips...")
-        with z.open("trips.txt") as f:
-            trips_df = pd.read_csv(f)
-            trips_df = trips_df.fillna("")
+    loaded = changed is not None
+    if loaded and validators is not None:
+        save_feed_validators(validators)
+    if changed == []:
+        print("Static GTFS unchanged, keeping the current version")
+    elif loaded:
+        # Tell API workers to rebuild their in-process static indexes
+        redis_client = redis.Redis.from_url(settings.REDIS_URL, decode_responses=True)
+        version = bump_static_version(redis_client)
+        print(f"GTFS Static Load Complete! (version {version})")
+    print(f"Peak loader memory: {peak_memory_mb():.0f} MB")
+    return loaded
+
+def load_with_copy(z: zipfile.ZipFile, full: bool = False, workers: int = 1):
+    """
+    Differential COPY load. Each changed file is staged in a shadow table and
+    upserted into the live table; then, children first, live rows missing from
+    the shadow copy are deleted. Everything commits at once, so readers see the
+    old schedule or the new one, never a mix. With workers > 1 the changed files
+    are parsed and staged by a process pool (gtfs_parallel) before the merge.
+    Returns the list of files that changed, or None if the load failed.
+    """
+    conn = engine.raw_connection()
+    try:
+        with conn.cursor() as cursor:
+            # Read even when `full`: it still decides which dropped files to clear
+            known = loaded_file_hashes(cursor)
+            plan = [] # (file_name, table, sha256); sha256 None = file dropped from the feed
 
-        print("Loading stop_times (this might take a while)...")
-        with z.open("stop_times.txt") as f:
-            stop_times_df = pd.read_csv(f)
-            stop_times_df = stop_times_df.fillna("")
+            for file_name, table in COPY_LOAD_ORDER:
+                if file_name not in z.namelist():
+                    if file_name not in OPTIONAL_FILES:
+                        raise FileNotFoundError(f"{file_name} missing from GTFS feed")
+                    if file_name in known:
+                        # Dropped from the feed: an empty shadow table prunes every row
+                        print(f"{file_name} no longer in feed, clearing {table}...")
+                        plan.append((file_name, table, None))
+                    continue
+
+                sha256 = file_sha256(z, file_name)
+                if not full and known.get(file_name) == sha256:
+                    print(f"{file_name} unchanged, skipping")
+                    continue
+                plan.append((file_name, table, sha256))
+
+            prestaged = {}
+            if workers > 1:
+                prestaged = stage_parallel(z, [(f, t) for f, t, sha256 in plan if sha256], workers)
+
+            staged = [] # (file_name, table, staging table, sha256, rows)
+            for file_name, table, sha256 in plan:
+                if table in prestaged:
+                    staging, rows = prestaged[table]
+                else:
+                    print(f"Loading {file_name}...")
+                    chunks = read_gtfs_chunks(z, file_name, table) if sha256 else []
+                    staging, rows = stage_chunks(cursor, table, chunks)
+                written = merge_staging_table(cursor, table, staging)
+                print(f"Staged {rows} rows for {table}, {written} new or changed")
+                staged.append((file_name, table, staging, sha256, rows))
+
+            for file_name, table, staging, sha256, rows in reversed(staged):
+                removed = delete_missing_rows(cursor, table, staging)
+                if removed:
+                    print(f"Removed {removed} rows from {table}")
+                cursor.execute(f"DROP TABLE {staging}")
+                record_file_hash(cursor, file_name, sha256, rows)
+        # One transaction: readers see the old feed or the new one, never a mix
+        conn.commit()
+        return [file_name for file_name, *_ in staged]
+    except Exception as e:
+        print(f"Error loading GTFS: {e}")
+        conn.rollback()
+        return None
+    finally:
+        conn.close()
+
+def load_with_orm(z: zipfile.ZipFile) -> bool:
+    print("Loading routes...")
+    with z.open("routes.txt") as f:
+        routes_df = pd.read_csv(f)
+        routes_df = routes_df.fillna("")
+        
+    print("Loading stops...")
+    with z.open("stops.txt") as f:
+        stops_df = pd.read_csv(f)
+        stops_df = stops_df.fillna("")
+
+    print("Loading trips...")
+    with z.open("trips.txt") as f:
+        trips_df = pd.read_csv(f)
+        trips_df = trips_df.fillna("")
+
+    print("Loading stop_times (this might take a while)...")
+    with z.open("stop_times.txt") as f:
+        stop_times_df = pd.read_csv(f)
+        stop_times_df = stop_times_df.fillna("")
+
+    calendar_df = None
+    if "calendar.txt" in z.namelist():
+        print("Loading calendar...")
+        with z.open("calendar.txt") as f:
+            calendar_df = pd.read_csv(f, dtype={'service_id': str})
+
+    calendar_dates_df = None
+    if "calendar_dates.txt" in z.namelist():
+        print("Loading calendar_dates...")
+        with z.open("calendar_dates.txt") as f:
+            calendar_dates_df = pd.read_csv(f, dtype={'service_id': str})
 
     db: Session = SessionLocal()
     try:
@@ -73,6 +295,26 @@ def load_gtfs_static():
             )
             db.merge(stop)
 
+        # Load Service Calendar
+        if calendar_df is not None:
+            print(f"Inserting {len(calendar_df)} calendar entries...")
+            for _, row in calendar_df.iterrows():
+                db.merge(ServiceCalendar(
+                    service_id=str(row['service_id']),
+                    start_date=parse_gtfs_date(row['start_date']),
+                    end_date=parse_gtfs_date(row['end_date']),
+                    **{day: int(row[day]) for day in WEEKDAY_COLUMNS}
+                ))
+
+        if calendar_dates_df is not None:
+            print(f"Inserting {len(calendar_dates_df)} calendar_dates entries...")
+            for _, row in calendar_dates_df.iterrows():
+                db.merge(CalendarDate(
+                    service_id=str(row['service_id']),
+                    date=parse_gtfs_date(row['date']),
+                    exception_type=int(row['exception_type'])
+                ))
+
         db.commit()
 
         # Load Trips
@@ -110,7 +352,9 @@ def load_gtfs_static():
                 stop_id=str(row['stop_id']),
                 stop_sequence=int(row['stop_sequence']),
                 arrival_time=row.get('arrival_time'),
-                departure_time=row.get('departure_time')
+                departure_time=row.get('departure_time'),
+                arrival_secs=gtfs_time_to_seconds(row.get('arrival_time')),
+                departure_secs=gtfs_time_to_seconds(row.get('departure_time'))
             ))
             
             if len(stop_times_to_insert) >= 5000:
@@ -122,13 +366,22 @@ def load_gtfs_static():
             db.bulk_save_objects(stop_times_to_insert)
             db.commit()
 
-        print("GTFS Static Load Complete!")
+        return True
         
     except Exception as e:
         print(f"Error loading GTFS: {e}")
         db.rollback()
+        return False
     finally:
         db.close()
 
 if __name__ == "__main__":
-    load_gtfs_static()
+    parser = argparse.ArgumentParser(description="Load the static GTFS feed into Postgres.")
+    parser.add_argument("--method", choices=["copy", "orm"], default="copy")
+    parser.add_argument("--workers", type=int, default=1, help="Parallel parse/stage processes for --method copy (e.g. one per core)")
+    parser.add_argument("--full", action="store_true", help="Download unconditionally and reload every file, even if unchanged")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--file", help="Load a local GTFS zip instead of downloading (air-gapped / testing)")
+    source.add_argument("--url", default=GTFS_URL, help="Feed URL (default: GTFS_STATIC_URL)")
+    args = parser.parse_args()
+    load_gtfs_static(gtfs_zip=args.file, method=args.method, full=args.full, url=args.url, workers=args.workers)
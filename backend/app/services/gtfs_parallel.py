@@ -0,0 +1,127 @@
+"""
+Parallel staging for the COPY loader.
+
+Each changed zip member is extracted to a scratch directory and cut into byte
+ranges on line boundaries. A process pool parses the ranges (pandas, bounded
+chunks) and COPYs them into UNLOGGED staging tables over separate connections,
+so stop_times.txt is parsed on every core instead of one. Staging tables carry
+no foreign keys; gtfs_loader merges them into the live tables afterwards in
+foreign-key order, in its single transaction.
+
+Splitting on newlines assumes no quoted field spans lines, which holds for the
+numeric/ID-only stop_times.txt that dominates the load; smaller files are
+never split.
+"""
+import csv
+import io
+import os
+import shutil
+import tempfile
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+from app.db.session import engine
+from app.services.gtfs_bulk import create_staging_table, copy_frame, prepare_frame, source_columns
+
+# Files smaller than this are loaded as one range
+SPLIT_MIN_BYTES = 8 << 20
+# Upper bound on a range (and on what one worker holds in memory at a time)
+MAX_RANGE_BYTES = 64 << 20
+# Rows per COPY inside a range
+RANGE_CHUNK_ROWS = 100_000
+
+def extract_member(z: zipfile.ZipFile, file_name: str, directory: str) -> str:
+    path = os.path.join(directory, file_name)
+    with z.open(file_name) as src, open(path, "wb") as dst:
+        shutil.copyfileobj(src, dst, 1 << 20)
+    return path
+
+def read_header(path: str) -> tuple:
+    """(column names, byte offset of the first data row)."""
+    with open(path, "rb") as f:
+        line = f.readline()
+        columns = next(csv.reader([line.decode("utf-8-sig")]))
+        return [c.strip() for c in columns], f.tell()
+
+def split_ranges(path: str, data_start: int, workers: int) -> list:
+    """Cuts [data_start, EOF) into newline-aligned (start, end) byte ranges."""
+    size = os.path.getsize(path)
+    if size <= data_start:
+        return []
+    if size - data_start < SPLIT_MIN_BYTES:
+        return [(data_start, size)]
+
+    # A few ranges per worker keeps the pool busy when ranges parse unevenly
+    target = min(MAX_RANGE_BYTES, max(1 << 20, (size - data_start) // (workers * 4)))
+    ranges = []
+    with open(path, "rb") as f:
+        start = data_start
+        while start < size:
+            f.seek(min(start + target, size))
+            f.readline() # advance to the end of the row the cut landed in
+            end = min(f.tell(), size)
+            ranges.append((start, end))
+            start = end
+    return ranges
+
+def _init_worker():
+    # Connections inherited from the parent over fork must not be reused
+    engine.dispose(close=False)
+
+def copy_range(table: str, staging: str, path: str, columns: list, start: int, end: int) -> int:
+    """Worker: parses one byte range of a GTFS file and COPYs it into `staging`. Returns rows."""
+    with open(path, "rb") as f:
+        f.seek(start)
+        data = io.BytesIO(f.read(end - start))
+
+    wanted = source_columns(table)
+    reader = pd.read_csv(
+        data, header=None, names=columns, dtype=str, chunksize=RANGE_CHUNK_ROWS,
+        usecols=lambda col: col in wanted,
+    )
+    rows = 0
+    conn = engine.raw_connection()
+    try:
+        with conn.cursor() as cursor:
+            for chunk in reader:
+                copy_frame(cursor, staging, prepare_frame(table, chunk))
+                rows += len(chunk)
+        conn.commit()
+    finally:
+        conn.close()
+    return rows
+
+def stage_parallel(z: zipfile.ZipFile, files: list, workers: int) -> dict:
+    """
+    Stages every (file_name, table) in `files` concurrently across `workers` processes.
+    Returns {table: (staging table, rows)}; the caller merges and drops the staging tables.
+    """
+    conn = engine.raw_connection()
+    try:
+        with conn.cursor() as cursor:
+            staging = {table: create_staging_table(cursor, table, unlogged=True) for _, table in files}
+        # Committed so the worker connections can see them
+        conn.commit()
+
+        with tempfile.TemporaryDirectory(prefix="gtfs-") as scratch:
+            jobs = []
+            for file_name, table in files:
+                path = extract_member(z, file_name, scratch)
+                columns, data_start = read_header(path)
+                for start, end in split_ranges(path, data_start, workers):
+                    jobs.append((table, staging[table], path, columns, start, end))
+            print(f"Staging {len(files)} files as {len(jobs)} ranges on {workers} workers...")
+
+            rows = dict.fromkeys(staging, 0)
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+                futures = [(job[0], pool.submit(copy_range, *job)) for job in jobs]
+                for table, future in futures:
+                    rows[table] += future.result()
+
+        with conn.cursor() as cursor:
+            for name in staging.values():
+                cursor.execute(f"ANALYZE {name}")
+        conn.commit()
+    finally:
+        conn.close()
+    return {table: (staging[table], rows[table]) for table in staging}
@@ -1,15 +1,43 @@
 from google.transit import gtfs_realtime_pb2
+from google.protobuf.message import DecodeError
+from requests.adapters import HTTPAdapter
+from array import array
+from typing import Optional
+import hashlib
 import requests
+from app.services.rt_cache import feed_state_key, feed_stats_key
 
 # Feed URLs
 VEHICLE_POSITIONS_URL = "https://rideconnecttransit.com/gtfs-rt/vehiclepositions"
 TRIP_UPDATES_URL = "https://rideconnecttransit.com/gtfs-rt/tripupdates"
 ALERTS_URL = "https://rideconnecttransit.com/gtfs-rt/alerts"
 
+# Feed name (Redis state / stats keys) -> URL
+RT_FEEDS = {
+    "vehicle_positions": VEHICLE_POSITIONS_URL,
+    "trip_updates": TRIP_UPDATES_URL,
+    "alerts": ALERTS_URL,
+}
+
+_session = None
+
+def get_session() -> requests.Session:
+    """
+    Process-wide session: keep-alive connections are pooled per host and reused
+    across polls. Created on first use so forked worker processes get their own.
+    """
+    global _session
+    if _session is None:
+        _session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8)
+        _session.mount("http://", adapter)
+        _session.mount("https://", adapter)
+    return _session
+
 def fetch_feed(url: str):
     """Fetches and parses a GTFS-RT feed."""
     try:
-        response = requests.get(url, timeout=10)
+        response = get_session().get(url, timeout=10)
         response.raise_for_status()
         feed = gtfs_realtime_pb2.FeedMessage()
         feed.ParseFromString(response.content)
@@ -18,6 +46,109 @@ def fetch_feed(url: str):
         print(f"Error fetching feed {url}: {e}")
         return None
 
+def peek_header_timestamp(content: bytes) -> Optional[int]:
+    """
+    FeedHeader.timestamp without parsing the whole FeedMessage: the header is
+    field 1 (tag 0x0A, length-delimited) and producers serialize it first.
+    Returns None if the message does not start with it.
+    """
+    if not content or content[0] != 0x0A:
+        return None
+    length, shift, i = 0, 0, 1
+    while i < len(content):
+        byte = content[i]
+        i += 1
+        length |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            break
+        shift += 7
+    try:
+        return gtfs_realtime_pb2.FeedHeader.FromString(content[i:i + length]).timestamp or None
+    except DecodeError:
+        return None
+
+class FeedClient:
+    """
+    Conditional poller for one GTFS-RT feed.
+
+    poll() sends If-None-Match / If-Modified-Since from the last processed poll,
+    then compares the body's digest and FeedHeader.timestamp with it, and only
+    parses (and returns) the feed when something changed. Callers call
+    mark_processed() once their writes succeeded, so a failed cycle is retried.
+    Poll state and outcome counters live in Redis, shared by all worker processes.
+
+    After each poll, last_outcome is 'changed', 'not_modified', 'unchanged' or
+    'failed', and last_timestamp is the FeedHeader timestamp of the last changed feed.
+    """
+    def __init__(self, name: str, url: str, redis_client):
+        self.name = name
+        self.url = url
+        self.redis = redis_client
+        self._pending = None # state of the poll being processed
+        self.last_outcome = None
+        self.last_timestamp = 0
+
+    def poll(self):
+        try:
+            state = self.redis.hgetall(feed_state_key(self.name))
+        except Exception as e:
+            print(f"Could not read feed state for {self.name}: {e}")
+            state = {}
+
+        headers = {}
+        if state.get('etag'):
+            headers['If-None-Match'] = state['etag']
+        if state.get('last_modified'):
+            headers['If-Modified-Since'] = state['last_modified']
+
+        try:
+            response = get_session().get(self.url, headers=headers, timeout=10)
+            if response.status_code == 304:
+                self.count('not_modified')
+                return None
+            response.raise_for_status()
+
+            content = response.content
+            digest = hashlib.sha1(content).hexdigest()
+            timestamp = peek_header_timestamp(content)
+            if digest == state.get('digest') or (timestamp and str(timestamp) == state.get('timestamp')):
+                self.count('unchanged')
+                return None
+
+            feed = gtfs_realtime_pb2.FeedMessage()
+            feed.ParseFromString(content)
+        except Exception as e:
+            print(f"Error fetching feed {self.url}: {e}")
+            self.count('failed')
+            return None
+
+        self._pending = {
+            'etag': response.headers.get('ETag') or '',
+            'last_modified': response.headers.get('Last-Modified') or '',
+            'digest': digest,
+            'timestamp': timestamp or feed.header.timestamp or '',
+        }
+        self.last_outcome = 'changed'
+        self.last_timestamp = timestamp or feed.header.timestamp
+        return feed
+
+    def mark_processed(self):
+        """Records the last poll as handled: identical follow-up polls are skipped."""
+        if self._pending is None:
+            return
+        pipe = self.redis.pipeline()
+        pipe.hset(feed_state_key(self.name), mapping=self._pending)
+        pipe.hincrby(feed_stats_key(self.name), 'processed', 1)
+        pipe.execute()
+        self._pending = None
+
+    def count(self, outcome: str):
+        self.last_outcome = outcome
+        try:
+            self.redis.hincrby(feed_stats_key(self.name), outcome, 1)
+        except Exception as e:
+            print(f"Could not record feed stats for {self.name}: {e}")
+
 def parse_vehicle_positions(feed):
     vehicles = []
     if not feed:
@@ -69,3 +200,77 @@ def parse_trip_updates(feed):
                 'stop_time_updates': stop_time_updates
             })
     return updates
+
+class TripUpdateColumns:
+    """
+    Trip updates decoded into parallel columns instead of one dict per entity
+    and per stop_time_update. Trip i's stop_time_updates are rows
+    offsets[i]:offsets[i + 1] of the stop_* / arrival_delays columns.
+
+    Only the fields the ingest path consumes are decoded; callers that need
+    the full documents (times, vehicle, ...) use parse_trip_updates().
+    """
+    def __init__(self, trip_ids: list, route_ids: list, offsets: array, stop_sequences: array, stop_ids: list, arrival_delays: array):
+        self.trip_ids = trip_ids
+        self.route_ids = route_ids
+        self.offsets = offsets
+        self.stop_sequences = stop_sequences
+        self.stop_ids = stop_ids
+        self.arrival_delays = arrival_delays
+
+    def __len__(self):
+        return len(self.trip_ids)
+
+    def delays(self, i: int) -> dict:
+        """stop_sequence -> arrival_delay for trip i (first update for a stop_sequence wins)."""
+        lo, hi = self.offsets[i], self.offsets[i + 1]
+        return dict(zip(reversed(self.stop_sequences[lo:hi]), reversed(self.arrival_delays[lo:hi])))
+
+def parse_trip_updates_columnar(feed) -> TripUpdateColumns:
+    trip_ids, route_ids, offsets = [], [], [0]
+    stop_sequences, stop_ids, arrival_delays = [], [], []
+    if feed:
+        # Bound appends: this loop runs once per stop_time_update of the whole feed
+        add_sequence, add_stop, add_delay = stop_sequences.append, stop_ids.append, arrival_delays.append
+        for entity in feed.entity:
+            if not entity.HasField('trip_update'):
+                continue
+            tu = entity.trip_update
+            trip_ids.append(tu.trip.trip_id)
+            route_ids.append(tu.trip.route_id)
+            for stu in tu.stop_time_update:
+                add_sequence(stu.stop_sequence)
+                add_stop(stu.stop_id)
+                add_delay(stu.arrival.delay)
+            offsets.append(len(stop_sequences))
+
+    return TripUpdateColumns(
+        trip_ids, route_ids, array('l', offsets),
+        array('l', stop_sequences), stop_ids, array('l', arrival_delays),
+    )
+
+def _translated(text) -> str:
+    """First translation of a GTFS-RT TranslatedString ('' if unset)."""
+    return text.translation[0].text if text.translation else ""
+
+def parse_alerts(feed):
+    alerts = []
+    if not feed:
+        return alerts
+
+    for entity in feed.entity:
+        if entity.HasField('alert'):
+            a = entity.alert
+            alerts.append({
+                'id': entity.id,
+                'header': _translated(a.header_text),
+                'description': _translated(a.description_text),
+                'cause': a.cause,
+                'effect': a.effect,
+                'active_periods': [{'start': p.start, 'end': p.end} for p in a.active_period],
+                'informed_entities': [
+                    {'route_id': ie.route_id, 'stop_id': ie.stop_id, 'trip_id': ie.trip.trip_id}
+                    for ie in a.informed_entity
+                ],
+            })
+    return alerts
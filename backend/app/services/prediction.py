@@ -46,4 +46,27 @@ class PredictionService:
             print(f"Prediction error: {e}")
             return {'probability_late_5min': 0.0, 'predicted_delay': 0.0}
 
+    def predict_many(self, features_list: list) -> list:
+        """
+        Batch version of predict(): scores every feature dict in one
+        DataFrame / one pipeline pass. Results keep the input order.
+        """
+        if not features_list:
+            return []
+
+        if not self.model:
+            return [{'probability_late_5min': 0.0, 'predicted_delay': 0.0} for _ in features_list]
+
+        df = pd.DataFrame(features_list)
+
+        try:
+            probs = self.model.predict_proba(df)[:, 1]
+            return [
+                {'probability_late_5min': float(prob), 'predicted_delay': 0.0}
+                for prob in probs
+            ]
+        except Exception as e:
+            print(f"Prediction error: {e}")
+            return [{'probability_late_5min': 0.0, 'predicted_delay': 0.0} for _ in features_list]
+
 prediction_service = PredictionService()
@@ -0,0 +1,216 @@
+"""
+Historical archive of real-time observations (vehicle positions, stop-time delays) in Postgres.
+
+The ingest daemon hands each cycle's new observations to RealtimeArchiver, which
+only appends them to an in-memory buffer. A background thread flushes the buffer
+every FLUSH_SECONDS (sooner once it holds FLUSH_ROWS rows): one COPY per table
+into a staging table, then INSERT ... ON CONFLICT DO NOTHING into the archive, so
+an observation seen twice is stored once. The hot ingest loop never waits on
+Postgres; if Postgres is down the buffer keeps the rows for the next flush, up to
+MAX_BUFFER_ROWS per table, after which the oldest are dropped (and counted).
+
+rt_vehicle_positions and rt_trip_updates_raw are partitioned by UTC day. A
+partition is created before the first flush that needs it, and partitions older
+than settings.RT_ARCHIVE_RETENTION_DAYS are dropped (checked once a day).
+"""
+import csv
+import datetime
+import io
+import threading
+from app.core.config import settings
+from app.db.session import engine
+from app.services.gtfs_bulk import create_staging_table
+
+# Archive columns in COPY order; the first one is the partition key
+ARCHIVE_COLUMNS = {
+    'rt_vehicle_positions': [
+        'observed_at', 'vehicle_id', 'trip_id', 'route_id', 'stop_id', 'lat', 'lon', 'bearing', 'speed', 'current_status',
+    ],
+    'rt_trip_updates_raw': ['feed_timestamp', 'trip_id', 'stop_sequence', 'stop_id', 'route_id', 'arrival_delay'],
+}
+
+# Text key columns: an empty field stays "" instead of becoming NULL in COPY
+KEY_TEXT_COLUMNS = {
+    'rt_vehicle_positions': ['vehicle_id'],
+    'rt_trip_updates_raw': ['trip_id', 'stop_id'],
+}
+
+FLUSH_SECONDS = 30
+FLUSH_ROWS = 50_000
+MAX_BUFFER_ROWS = 1_000_000
+
+def utc_timestamp(epoch_seconds: int) -> str:
+    return datetime.datetime.fromtimestamp(epoch_seconds, datetime.timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+
+def vehicle_rows(vehicles: list, feed_timestamp: int) -> list:
+    """Archive rows for parsed vehicles (gtfs_rt.parse_vehicle_positions)."""
+    return [
+        (utc_timestamp(v['timestamp'] or feed_timestamp), v['vehicle_id'], v['trip_id'], v['route_id'], v['stop_id'],
+         v['lat'], v['lon'], v['bearing'], v['speed'], v['current_status'])
+        for v in vehicles
+    ]
+
+def trip_update_rows(columns, indexes: list, feed_timestamp: int) -> list:
+    """Archive rows for trips `indexes` of a gtfs_rt.TripUpdateColumns, one per stop_time_update."""
+    observed = utc_timestamp(feed_timestamp)
+    offsets = columns.offsets
+    rows = []
+    for i in indexes:
+        trip_id, route_id = columns.trip_ids[i], columns.route_ids[i]
+        for j in range(offsets[i], offsets[i + 1]):
+            rows.append((observed, trip_id, columns.stop_sequences[j], columns.stop_ids[j], route_id, columns.arrival_delays[j]))
+    return rows
+
+def partition_name(table: str, day: datetime.date) -> str:
+    return f"{table}_p{day:%Y%m%d}"
+
+def ensure_partitions(cursor, table: str, days):
+    for day in sorted(days):
+        cursor.execute(
+            f"CREATE TABLE IF NOT EXISTS {partition_name(table, day)} PARTITION OF {table} "
+            f"FOR VALUES FROM ('{day}') TO ('{day + datetime.timedelta(days=1)}')"
+        )
+
+def drop_expired_partitions(cursor, table: str, oldest_kept: datetime.date) -> list:
+    """Drops the day partitions of `table` older than oldest_kept. Returns their names."""
+    cursor.execute(
+        "SELECT c.relname FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid JOIN pg_class p ON p.oid = i.inhparent "
+        "WHERE p.relname = %s",
+        (table,)
+    )
+    dropped = []
+    for (name,) in cursor.fetchall():
+        try:
+            day = datetime.datetime.strptime(name.rsplit("_p", 1)[-1], "%Y%m%d").date()
+        except ValueError:
+            continue # not one of ours
+        if day < oldest_kept:
+            cursor.execute(f"DROP TABLE {name}")
+            dropped.append(name)
+    return dropped
+
+def write_rows(cursor, table: str, rows: list) -> int:
+    """COPYs rows into `table` through a staging table. Returns the rows actually inserted."""
+    columns = ARCHIVE_COLUMNS[table]
+    ensure_partitions(cursor, table, {datetime.date.fromisoformat(row[0][:10]) for row in rows})
+
+    staging = create_staging_table(cursor, table)
+    buf = io.StringIO()
+    csv.writer(buf).writerows(rows)
+    buf.seek(0)
+    cursor.copy_expert(
+        f"COPY {staging} ({', '.join(columns)}) FROM STDIN "
+        f"WITH (FORMAT csv, FORCE_NOT_NULL ({', '.join(KEY_TEXT_COLUMNS[table])}))",
+        buf
+    )
+    cursor.execute(
+        f"INSERT INTO {table} ({', '.join(columns)}) SELECT {', '.join(columns)} FROM {staging} "
+        f"ON CONFLICT DO NOTHING"
+    )
+    inserted = cursor.rowcount
+    cursor.execute(f"DROP TABLE {staging}")
+    return inserted
+
+class RealtimeArchiver:
+    """
+    Buffers observations from the ingest threads and writes them from its own thread.
+    Until start() is called the add_* methods are no-ops, so only the process that
+    owns an archiver (the ingest daemon) archives.
+    """
+    def __init__(self):
+        self._buffers = {table: [] for table in ARCHIVE_COLUMNS}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = None
+        self._maintained_on = None # UTC day partitions were last created / expired
+        self.dropped = 0
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="rt-archiver", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stops the flush thread after a last flush."""
+        if self._thread is None:
+            return
+        self._stopping.set()
+        self._wake.set()
+        self._thread.join()
+        self._thread = None
+
+    def add_vehicle_positions(self, vehicles: list, feed_timestamp: int):
+        if self._thread is not None and vehicles:
+            self._add('rt_vehicle_positions', vehicle_rows(vehicles, feed_timestamp))
+
+    def add_trip_updates(self, columns, indexes: list, feed_timestamp: int):
+        if self._thread is not None and indexes:
+            self._add('rt_trip_updates_raw', trip_update_rows(columns, indexes, feed_timestamp))
+
+    def _add(self, table: str, rows: list, front: bool = False):
+        with self._lock:
+            buffer = self._buffers[table]
+            if front:
+                buffer[:0] = rows
+            else:
+                buffer.extend(rows)
+            overflow = len(buffer) - MAX_BUFFER_ROWS
+            if overflow > 0:
+                del buffer[:overflow]
+                self.dropped += overflow
+                print(f"Archive buffer full: dropped {overflow} {table} rows ({self.dropped} so far)")
+            size = len(buffer)
+        if size >= FLUSH_ROWS:
+            self._wake.set()
+
+    def _run(self):
+        while not self._stopping.is_set():
+            self._wake.wait(FLUSH_SECONDS)
+            self._wake.clear()
+            self.flush()
+
+    def flush(self) -> dict:
+        """Writes everything buffered so far. Returns {table: rows inserted}."""
+        with self._lock:
+            batches = self._buffers
+            self._buffers = {table: [] for table in ARCHIVE_COLUMNS}
+
+        today = datetime.datetime.now(datetime.timezone.utc).date()
+        if not any(batches.values()) and self._maintained_on == today:
+            return {}
+
+        written = {}
+        conn = engine.raw_connection()
+        try:
+            with conn.cursor() as cursor:
+                if self._maintained_on != today:
+                    self.maintain_partitions(cursor, today)
+                for table, rows in batches.items():
+                    if rows:
+                        written[table] = write_rows(cursor, table, rows)
+            conn.commit()
+            self._maintained_on = today
+        except Exception as e:
+            conn.rollback()
+            print(f"Error archiving realtime observations: {e}")
+            # Keep the batch for the next flush (ahead of anything buffered meanwhile)
+            for table, rows in batches.items():
+                if rows:
+                    self._add(table, rows, front=True)
+            return {}
+        finally:
+            conn.close()
+
+        if written:
+            print("Archived " + ", ".join(f"{rows} {table}" for table, rows in written.items()))
+        return written
+
+    def maintain_partitions(self, cursor, today: datetime.date):
+        """Creates today's and tomorrow's partitions and drops those past retention."""
+        oldest_kept = today - datetime.timedelta(days=settings.RT_ARCHIVE_RETENTION_DAYS)
+        for table in ARCHIVE_COLUMNS:
+            ensure_partitions(cursor, table, [today, today + datetime.timedelta(days=1)])
+            dropped = drop_expired_partitions(cursor, table, oldest_kept)
+            if dropped:
+                print(f"Dropped expired archive partitions: {', '.join(dropped)}")
@@ -0,0 +1,296 @@
+"""
+Redis layout for real-time state.
+Shared by the ingest worker (writes) and the API (reads) so key names live in one place.
+"""
+import hashlib
+import json
+
+RT_TTL_SECONDS = 600 # Expire after 10 mins if no update
+
+# Per-entity change detection: a content hash of what was last written for each
+# vehicle / trip, kept next to the data. Entities whose hash is unchanged only get
+# their TTL refreshed (EXPIRE) instead of being re-written every cycle.
+VEHICLE_HASHES_KEY = "vehicles:hashes" # Hash: vehicle_id -> content hash of vehicle:{id}
+TRIP_DELAYS_HASHES_KEY = "trip_delays:hashes" # Hash: trip_id -> content hash of trip_delays:{id}
+
+def content_hash(payload: str) -> str:
+    return hashlib.blake2b(payload.encode(), digest_size=8).hexdigest()
+
+def cache_entity_hashes(pipe, key: str, hashes: dict, previous_hashes: dict):
+    """Queues the hash-map update: changed entries written, entities gone from the feed dropped."""
+    changed = {entity_id: h for entity_id, h in hashes.items() if previous_hashes.get(entity_id) != h}
+    removed = [entity_id for entity_id in previous_hashes if entity_id not in hashes]
+    if changed:
+        pipe.hset(key, mapping=changed)
+    if removed:
+        pipe.hdel(key, *removed)
+    pipe.expire(key, RT_TTL_SECONDS)
+
+# Feed timestamp of the last ingested trip-updates feed (drives arrivals ETags / max-age)
+TRIP_UPDATES_VERSION_KEY = "trip_updates:version"
+
+def trip_delays_key(trip_id: str) -> str:
+    # Hash: stop_sequence -> arrival_delay (seconds)
+    return f"trip_delays:{trip_id}"
+
+def cache_trip_update_columns(pipe, columns, previous_hashes: dict) -> list:
+    """
+    Queues the writes for a whole parsed feed (gtfs_rt.TripUpdateColumns): the
+    trip_delays:{trip_id} stop_sequence -> delay index of each trip.
+    Trips whose delays hash matches previous_hashes (HGETALL of TRIP_DELAYS_HASHES_KEY)
+    only get their TTL refreshed. Returns the indexes (into columns) of the trips written.
+    """
+    hashes = {}
+    changed = []
+    for i, trip_id in enumerate(columns.trip_ids):
+        key = trip_delays_key(trip_id)
+        delays = columns.delays(i)
+        hashes[trip_id] = h = content_hash(repr(delays))
+        if previous_hashes.get(trip_id) == h:
+            pipe.expire(key, RT_TTL_SECONDS)
+            continue
+
+        changed.append(i)
+        pipe.delete(key)
+        if delays:
+            pipe.hset(key, mapping=delays)
+            pipe.expire(key, RT_TTL_SECONDS)
+
+    cache_entity_hashes(pipe, TRIP_DELAYS_HASHES_KEY, hashes, previous_hashes)
+    return changed
+
+def fetch_arrival_delays(redis_client, trip_stops: list) -> list:
+    """
+    Looks up the real-time arrival delay for many (trip_id, stop_sequence) pairs
+    in a single round trip. Returns delays in seconds (None where there is no update),
+    in the same order as the input.
+    """
+    if not trip_stops:
+        return []
+
+    pipe = redis_client.pipeline(transaction=False)
+    for trip_id, stop_sequence in trip_stops:
+        pipe.hget(trip_delays_key(trip_id), stop_sequence)
+
+    return [int(v) if v is not None else None for v in pipe.execute()]
+
+# Arrival boards are rebuilt every feed cycle (~10s); let stale ones expire quickly
+# so the API falls back to live computation rather than serving an old window.
+BOARD_TTL_SECONDS = 30
+
+def arrival_board_key(stop_id: str) -> str:
+    return f"arrival_board:{stop_id}"
+
+def cache_arrival_board(pipe, stop_id: str, arrivals: list):
+    """Queues a pre-serialized arrival board (list of ArrivalSchema) for a stop."""
+    payload = json.dumps([a.model_dump() for a in arrivals])
+    pipe.set(arrival_board_key(stop_id), payload, ex=BOARD_TTL_SECONDS)
+
+# Whole-fleet snapshot, pre-serialized once per ingest cycle.
+# vehicles:version points at the current vehicles:snapshot:{version}; snapshots are
+# immutable so a reader that fetched the version always gets the matching payload.
+VEHICLES_VERSION_KEY = "vehicles:version"
+SNAPSHOT_TTL_SECONDS = 60
+
+def vehicles_snapshot_key(version) -> str:
+    return f"vehicles:snapshot:{version}"
+
+def cache_vehicles_snapshot(pipe, vehicles: list, version: int):
+    pipe.set(vehicles_snapshot_key(version), json.dumps(vehicles), ex=SNAPSHOT_TTL_SECONDS)
+    pipe.set(VEHICLES_VERSION_KEY, version, ex=RT_TTL_SECONDS)
+
+def touch_vehicles_snapshot(redis_client):
+    """Keeps the current snapshot alive through polls that found the feed unchanged."""
+    version = redis_client.get(VEHICLES_VERSION_KEY)
+    if version is not None:
+        redis_client.expire(vehicles_snapshot_key(version), SNAPSHOT_TTL_SECONDS)
+
+# Vehicle lookup indexes, rebuilt from scratch each cycle inside the ingest
+# transaction so a vehicle that changed route (or left the feed) never lingers
+# in an old route set.
+VEHICLES_GEO_KEY = "vehicles:geo" # GEO set: vehicle_id -> (lon, lat)
+VEHICLE_ROUTES_KEY = "vehicle_routes" # Set of route_ids that currently have a route_vehicles set
+
+def vehicle_key(vehicle_id: str) -> str:
+    return f"vehicle:{vehicle_id}"
+
+def route_vehicles_key(route_id: str) -> str:
+    # Set of vehicle_ids currently running route_id
+    return f"route_vehicles:{route_id}"
+
+def cache_vehicles(pipe, vehicles: list, previous_hashes: dict) -> list:
+    """
+    Queues vehicle:{vehicle_id} documents for the vehicles whose content changed
+    since the last cycle (previous_hashes = HGETALL of VEHICLE_HASHES_KEY); the
+    others only get their TTL refreshed. Returns the vehicles written.
+    """
+    hashes = {}
+    changed = []
+    for v in vehicles:
+        vehicle_id = v['vehicle_id']
+        document = json.dumps(v)
+        hashes[vehicle_id] = h = content_hash(document)
+        if previous_hashes.get(vehicle_id) == h:
+            pipe.expire(vehicle_key(vehicle_id), RT_TTL_SECONDS)
+        else:
+            pipe.set(vehicle_key(vehicle_id), document, ex=RT_TTL_SECONDS) # Expire after 10 mins if no update
+            changed.append(v)
+
+    cache_entity_hashes(pipe, VEHICLE_HASHES_KEY, hashes, previous_hashes)
+    return changed
+
+def cache_vehicle_indexes(pipe, vehicles: list, previous_route_ids: set):
+    """
+    Queues the rebuild of the GEO and per-route indexes for the current fleet.
+    previous_route_ids is SMEMBERS(VEHICLE_ROUTES_KEY) read before the pipeline,
+    so route sets that are now empty get dropped.
+    """
+    geo_values = []
+    by_route = {}
+    for v in vehicles:
+        # GEO only accepts valid coordinates (|lat| <= 85.05); 0/0 means "no fix"
+        if (v['lat'] or v['lon']) and abs(v['lat']) <= 85.05:
+            geo_values.extend([v['lon'], v['lat'], v['vehicle_id']])
+        if v['route_id']:
+            by_route.setdefault(v['route_id'], []).append(v['vehicle_id'])
+
+    pipe.delete(VEHICLES_GEO_KEY)
+    if geo_values:
+        pipe.geoadd(VEHICLES_GEO_KEY, geo_values)
+        pipe.expire(VEHICLES_GEO_KEY, RT_TTL_SECONDS)
+
+    for route_id in set(previous_route_ids) - set(by_route):
+        pipe.delete(route_vehicles_key(route_id))
+    for route_id, vehicle_ids in by_route.items():
+        key = route_vehicles_key(route_id)
+        pipe.delete(key)
+        pipe.sadd(key, *vehicle_ids)
+        pipe.expire(key, RT_TTL_SECONDS)
+
+    pipe.delete(VEHICLE_ROUTES_KEY)
+    if by_route:
+        pipe.sadd(VEHICLE_ROUTES_KEY, *by_route)
+        pipe.expire(VEHICLE_ROUTES_KEY, RT_TTL_SECONDS)
+
+# Delta feed: a short ring of recent snapshot versions, each with the change set
+# (vehicles added/moved, vehicles removed) relative to the version before it.
+# Clients polling with ?since=<version> get the union of the change sets after it.
+VEHICLES_VERSIONS_KEY = "vehicles:versions" # List, newest first
+VEHICLES_FINGERPRINTS_KEY = "vehicles:fingerprints" # Hash: vehicle_id -> fingerprint
+VEHICLES_RING_SIZE = 30 # ~5 minutes of 10s cycles
+
+def vehicles_changes_key(version) -> str:
+    return f"vehicles:changes:{version}"
+
+def vehicle_fingerprint(v: dict) -> str:
+    """What a map client cares about; the report timestamp alone is not a change."""
+    return f"{v['trip_id']}|{v['route_id']}|{v['lat']:.5f}|{v['lon']:.5f}|{v['bearing']:.0f}|{v['stop_id']}|{v['current_status']}"
+
+def cache_vehicle_changes(pipe, vehicles: list, version: int, previous_fingerprints: dict) -> int:
+    """
+    Queues the change set for `version` (diffed against previous_fingerprints,
+    i.e. HGETALL of VEHICLES_FINGERPRINTS_KEY before this cycle) and pushes it
+    onto the version ring. Returns the number of changed + removed vehicles.
+    """
+    fingerprints = {v['vehicle_id']: vehicle_fingerprint(v) for v in vehicles}
+    changed = [vid for vid, fp in fingerprints.items() if previous_fingerprints.get(vid) != fp]
+    removed = [vid for vid in previous_fingerprints if vid not in fingerprints]
+
+    pipe.delete(VEHICLES_FINGERPRINTS_KEY)
+    if fingerprints:
+        pipe.hset(VEHICLES_FINGERPRINTS_KEY, mapping=fingerprints)
+
+    changes = json.dumps({'changed': changed, 'removed': removed})
+    pipe.set(vehicles_changes_key(version), changes, ex=RT_TTL_SECONDS)
+    pipe.lpush(VEHICLES_VERSIONS_KEY, version)
+    pipe.ltrim(VEHICLES_VERSIONS_KEY, 0, VEHICLES_RING_SIZE - 1)
+    return len(changed) + len(removed)
+
+def fetch_vehicle_changes(redis_client, since: str) -> tuple:
+    """
+    Union of the change sets recorded after version `since`.
+    Returns (changed_ids, removed_ids), or None when `since` has fallen off the
+    ring (or a change set expired) and the caller must send a full snapshot.
+    """
+    versions = redis_client.lrange(VEHICLES_VERSIONS_KEY, 0, -1)
+    if since not in versions:
+        return None
+
+    newer = versions[:versions.index(since)]
+    if not newer:
+        return [], []
+
+    change_sets = redis_client.mget([vehicles_changes_key(v) for v in newer])
+    if any(cs is None for cs in change_sets):
+        return None
+
+    changed, removed = set(), set()
+    for cs in reversed(change_sets): # oldest first, so later changes win
+        cs = json.loads(cs)
+        changed.update(cs['changed'])
+        removed.difference_update(cs['changed'])
+        removed.update(cs['removed'])
+        changed.difference_update(cs['removed'])
+    return sorted(changed), sorted(removed)
+
+# Service alerts (GTFS-RT Alerts feed): whole list as one JSON document, replaced each cycle
+SERVICE_ALERTS_KEY = "service_alerts"
+SERVICE_ALERTS_VERSION_KEY = "service_alerts:version"
+
+def cache_service_alerts(pipe, alerts: list, version: int):
+    pipe.set(SERVICE_ALERTS_KEY, json.dumps(alerts), ex=RT_TTL_SECONDS)
+    pipe.set(SERVICE_ALERTS_VERSION_KEY, version, ex=RT_TTL_SECONDS)
+
+# Feed polling state, shared by every worker process polling the same feed:
+# - feed_state:{feed}: validators / content digest / header timestamp of the last processed poll
+# - feed_stats:{feed}: poll outcome counters (processed, not_modified, unchanged, failed)
+# - feed_lock:{feed}: held for the length of one poll + publish, so cycles never overlap
+# - feed_health:{feed}: schedule and freshness of the ingest daemon's last cycle
+def feed_state_key(feed: str) -> str:
+    return f"feed_state:{feed}"
+
+def feed_stats_key(feed: str) -> str:
+    return f"feed_stats:{feed}"
+
+def feed_lock_key(feed: str) -> str:
+    return f"feed_lock:{feed}"
+
+def feed_health_key(feed: str) -> str:
+    return f"feed_health:{feed}"
+
+def record_feed_health(redis_client, feed: str, health: dict):
+    redis_client.hset(feed_health_key(feed), mapping=health)
+
+def fetch_feed_health(redis_client, feeds, now: float) -> dict:
+    """
+    {feed: health} for the admin dashboard, in one round trip. freshness_lag_seconds
+    is the age of the newest ingested feed (now - its FeedHeader timestamp).
+    """
+    pipe = redis_client.pipeline(transaction=False)
+    for feed in feeds:
+        pipe.hgetall(feed_health_key(feed))
+
+    health = {}
+    for feed, fields in zip(feeds, pipe.execute()):
+        if not fields:
+            continue
+        header_timestamp = float(fields.get('header_timestamp') or 0)
+        health[feed] = {
+            'freshness_lag_seconds': round(now - header_timestamp, 1) if header_timestamp else None,
+            'ingest_lag_seconds': float(fields.get('ingest_lag') or 0),
+            'cadence_seconds': float(fields.get('cadence') or 0),
+            'poll_interval_seconds': float(fields.get('interval') or 0),
+            'consecutive_failures': int(fields.get('failures') or 0),
+            'last_outcome': fields.get('outcome'),
+        }
+    return health
+
+def fetch_feed_stats(redis_client, feeds) -> dict:
+    """{feed: {outcome: count}} for the admin dashboard, in one round trip."""
+    pipe = redis_client.pipeline(transaction=False)
+    for feed in feeds:
+        pipe.hgetall(feed_stats_key(feed))
+    return {
+        feed: {outcome: int(count) for outcome, count in stats.items()}
+        for feed, stats in zip(feeds, pipe.execute())
+    }
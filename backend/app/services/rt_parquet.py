@@ -0,0 +1,227 @@
+"""
+Rolling Parquet archive of GTFS-RT snapshots, for offline analytics and training.
+
+Every processed feed version is appended, whole, to a hive-partitioned dataset on
+local disk, one file per UTC hour:
+
+    {root}/trip_updates/date=2026-10-18/hour=14/part-1792332000-17.parquet
+    {root}/vehicle_positions/date=2026-10-18/hour=14/part-...parquet
+
+Readers prune on date / hour from the paths and on column statistics inside the
+files (ml/scripts/build_labels.py --parquet). Columns are narrow (int32 / float32,
+dictionary-encoded strings, zstd), one stop_time_update or vehicle per row.
+
+The ingest threads only hand the parsed feed to a queue; a writer thread turns it
+into Arrow batches and appends a row group every FLUSH_SECONDS (or ROW_GROUP_ROWS).
+The hour's file is written under a hidden ".inprogress-" name and renamed when the
+hour rolls over or the writer stops, so readers never see a file without a footer.
+"""
+import datetime
+import os
+import queue
+import threading
+import time
+import numpy as np
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+UTC_SECONDS = pa.timestamp('s', tz='UTC')
+
+SCHEMAS = {
+    'trip_updates': pa.schema([
+        ('feed_timestamp', UTC_SECONDS),
+        ('trip_id', pa.string()),
+        ('route_id', pa.string()),
+        ('stop_sequence', pa.int32()),
+        ('stop_id', pa.string()),
+        ('arrival_delay', pa.int32()), # seconds
+    ]),
+    'vehicle_positions': pa.schema([
+        ('feed_timestamp', UTC_SECONDS),
+        ('observed_at', UTC_SECONDS), # vehicle timestamp, else feed timestamp
+        ('vehicle_id', pa.string()),
+        ('trip_id', pa.string()),
+        ('route_id', pa.string()),
+        ('stop_id', pa.string()),
+        ('lat', pa.float32()),
+        ('lon', pa.float32()),
+        ('bearing', pa.float32()),
+        ('speed', pa.float32()),
+        ('current_status', pa.int8()),
+    ]),
+}
+
+# Directory partitioning shared by the writer and readers: date=YYYY-MM-DD/hour=H
+PARTITIONING = ds.partitioning(pa.schema([('date', pa.string()), ('hour', pa.int8())]), flavor='hive')
+
+FLUSH_SECONDS = 60
+ROW_GROUP_ROWS = 500_000
+# Parsed feeds waiting for the writer; when full (disk stalled) new ones are dropped
+MAX_QUEUED_FEEDS = 120
+
+def open_dataset(root: str, name: str) -> ds.Dataset:
+    """One of the SCHEMAS datasets under root, with its date / hour partition fields."""
+    schema = pa.unify_schemas([SCHEMAS[name], PARTITIONING.schema])
+    return ds.dataset(os.path.join(root, name), format='parquet', schema=schema, partitioning=PARTITIONING)
+
+def trip_updates_batch(columns, feed_timestamp: int) -> pa.RecordBatch:
+    """gtfs_rt.TripUpdateColumns -> one row per stop_time_update."""
+    offsets = np.asarray(columns.offsets)
+    trip_rows = np.repeat(np.arange(len(columns)), np.diff(offsets))
+    rows = len(trip_rows)
+    return pa.record_batch([
+        pa.array(np.full(rows, feed_timestamp), UTC_SECONDS),
+        pa.array(columns.trip_ids, pa.string()).take(trip_rows),
+        pa.array(columns.route_ids, pa.string()).take(trip_rows),
+        pa.array(np.asarray(columns.stop_sequences), pa.int32()),
+        pa.array(columns.stop_ids, pa.string()),
+        pa.array(np.asarray(columns.arrival_delays), pa.int32()),
+    ], schema=SCHEMAS['trip_updates'])
+
+def vehicle_positions_batch(vehicles: list, feed_timestamp: int) -> pa.RecordBatch:
+    """Parsed vehicles (gtfs_rt.parse_vehicle_positions) -> one row per vehicle."""
+    def column(field, type):
+        return pa.array([v[field] for v in vehicles], type)
+
+    return pa.record_batch([
+        pa.array(np.full(len(vehicles), feed_timestamp), UTC_SECONDS),
+        pa.array([v['timestamp'] or feed_timestamp for v in vehicles], UTC_SECONDS),
+        column('vehicle_id', pa.string()),
+        column('trip_id', pa.string()),
+        column('route_id', pa.string()),
+        column('stop_id', pa.string()),
+        column('lat', pa.float32()),
+        column('lon', pa.float32()),
+        column('bearing', pa.float32()),
+        column('speed', pa.float32()),
+        column('current_status', pa.int8()),
+    ], schema=SCHEMAS['vehicle_positions'])
+
+BATCH_BUILDERS = {
+    'trip_updates': trip_updates_batch,
+    'vehicle_positions': vehicle_positions_batch,
+}
+
+class HourFile:
+    """The open Parquet file of one dataset for one UTC hour."""
+    def __init__(self, root: str, name: str, hour: datetime.datetime):
+        self.hour = hour
+        directory = os.path.join(root, name, f"date={hour:%Y-%m-%d}", f"hour={hour.hour}")
+        os.makedirs(directory, exist_ok=True)
+        file_name = f"part-{int(time.time())}-{os.getpid()}.parquet"
+        self.path = os.path.join(directory, file_name)
+        self.partial_path = os.path.join(directory, f".inprogress-{file_name}")
+        self.writer = pq.ParquetWriter(
+            self.partial_path, SCHEMAS[name], compression='zstd', use_dictionary=True, write_statistics=True,
+        )
+        self.pending = []
+        self.pending_rows = 0
+        self.rows = 0
+
+    def add(self, batch: pa.RecordBatch):
+        self.pending.append(batch)
+        self.pending_rows += batch.num_rows
+
+    def flush(self):
+        """Writes what is pending as one row group."""
+        if self.pending:
+            self.writer.write_table(pa.Table.from_batches(self.pending), row_group_size=max(self.pending_rows, 1))
+            self.rows += self.pending_rows
+            self.pending, self.pending_rows = [], 0
+
+    def close(self):
+        self.flush()
+        self.writer.close()
+        os.replace(self.partial_path, self.path)
+
+class ParquetSnapshotWriter:
+    """
+    Queues parsed feeds from the ingest threads and writes them from its own thread.
+    Until start() is called the add_* methods are no-ops.
+    """
+    def __init__(self, root: str):
+        self.root = root
+        self._queue = queue.Queue(maxsize=MAX_QUEUED_FEEDS)
+        self._thread = None
+        self._files = {} # dataset name -> HourFile
+        self.dropped = 0
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="rt-parquet", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Writes out everything queued, closes the open files and stops the thread."""
+        if self._thread is None:
+            return
+        self._queue.put(None)
+        self._thread.join()
+        self._thread = None
+
+    def add_trip_updates(self, columns, feed_timestamp: int):
+        self._add('trip_updates', columns, feed_timestamp)
+
+    def add_vehicle_positions(self, vehicles: list, feed_timestamp: int):
+        self._add('vehicle_positions', vehicles, feed_timestamp)
+
+    def _add(self, name: str, parsed, feed_timestamp: int):
+        # The parsed feed is not modified after ingest, so it is handed over as is
+        if self._thread is None or not len(parsed):
+            return
+        try:
+            self._queue.put_nowait((name, parsed, feed_timestamp))
+        except queue.Full:
+            self.dropped += 1
+            print(f"Parquet writer behind: dropped a {name} snapshot ({self.dropped} so far)")
+
+    def _run(self):
+        last_flush = time.monotonic()
+        while True:
+            try:
+                item = self._queue.get(timeout=FLUSH_SECONDS)
+            except queue.Empty:
+                item = ()
+            if item is None:
+                break
+            if item:
+                try:
+                    self._write(*item)
+                except Exception as e:
+                    print(f"Error writing {item[0]} Parquet snapshot: {e}")
+            if time.monotonic() - last_flush >= FLUSH_SECONDS:
+                self._flush_all()
+                last_flush = time.monotonic()
+        self._close_all()
+
+    def _write(self, name: str, parsed, feed_timestamp: int):
+        batch = BATCH_BUILDERS[name](parsed, feed_timestamp)
+        hour = datetime.datetime.fromtimestamp(feed_timestamp, datetime.timezone.utc).replace(minute=0, second=0)
+        current = self._files.get(name)
+        if current is not None and current.hour != hour:
+            self._close(name)
+            current = None
+        if current is None:
+            current = self._files[name] = HourFile(self.root, name, hour)
+        current.add(batch)
+        if current.pending_rows >= ROW_GROUP_ROWS:
+            current.flush()
+
+    def _flush_all(self):
+        for name, current in self._files.items():
+            try:
+                current.flush()
+            except Exception as e:
+                print(f"Error writing {name} Parquet snapshot: {e}")
+
+    def _close(self, name: str):
+        current = self._files.pop(name)
+        try:
+            current.close()
+            print(f"Wrote {current.path} ({current.rows} rows)")
+        except Exception as e:
+            print(f"Error closing {current.partial_path}: {e}")
+
+    def _close_all(self):
+        for name in list(self._files):
+            self._close(name)
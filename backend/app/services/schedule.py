@@ -0,0 +1,123 @@
+import datetime
+from typing import Optional
+from zoneinfo import ZoneInfo
+from sqlalchemy import and_, func, literal, select, union_all
+from sqlalchemy.orm import Session, contains_eager
+from app.core.config import settings
+from app.models.gtfs import StopTime, Trip
+from app.services.service_calendar import service_calendar
+
+SECONDS_PER_DAY = 24 * 3600
+
+def gtfs_time_to_seconds(value) -> Optional[int]:
+    """
+    Converts a GTFS 'HH:MM:SS' time to seconds since service-day midnight.
+    Hours can go past 24 for trips that run after midnight ('25:10:00' -> 90600).
+    Returns None for blank / malformed values.
+    """
+    if not isinstance(value, str):
+        return None
+    parts = value.strip().split(':')
+    if len(parts) != 3:
+        return None
+    try:
+        h, m, s = (int(p) for p in parts)
+    except ValueError:
+        return None
+    return h * 3600 + m * 60 + s
+
+def agency_now() -> datetime.datetime:
+    return datetime.datetime.now(ZoneInfo(settings.AGENCY_TIMEZONE))
+
+def active_service_ids(service_date: datetime.date) -> Optional[frozenset]:
+    """
+    Service IDs running on a date per calendar.txt + calendar_dates.txt, from the
+    precomputed in-process calendar (no DB round trip).
+    Returns None when the feed has no calendar at all (callers should not filter then).
+    """
+    return service_calendar.get().active_on(service_date)
+
+def upcoming_stop_times(db: Session, stop_id: str, now: datetime.datetime, window_minutes: int = 60, limit: int = 50) -> list:
+    """
+    Scheduled stop_times at a stop in [now, now + window), for trips running today.
+    Returns a list of (StopTime, service_date) sorted by actual arrival time.
+    """
+    return upcoming_stop_times_for_stops(db, [stop_id], now, window_minutes, limit)[stop_id]
+
+def upcoming_stop_times_for_stops(db: Session, stop_ids: list, now: datetime.datetime, window_minutes: int = 60, limit: int = 50) -> dict:
+    """
+    Same as upcoming_stop_times() for many stops in a single SQL query.
+
+    A trip from yesterday's service day can still be running after midnight
+    (arrival_secs >= 86400), so the query covers both service days; each branch
+    is a range scan on (stop_id, arrival_secs) that keeps the first `limit` rows
+    per stop (ROW_NUMBER() over stop_id), and the branches are merged here.
+
+    Returns {stop_id: [(StopTime, service_date), ...]} sorted by actual arrival time,
+    at most `limit` rows per stop.
+    """
+    today = now.date()
+    now_secs = now.hour * 3600 + now.minute * 60 + now.second
+    window_secs = window_minutes * 60
+
+    results = {stop_id: [] for stop_id in stop_ids}
+    if not stop_ids:
+        return results
+
+    service_dates = []
+    ranked = []
+    for service_date in (today, today - datetime.timedelta(days=1)):
+        lo = now_secs + (today - service_date).days * SECONDS_PER_DAY
+        query = select(
+            StopTime.trip_id, StopTime.stop_id, StopTime.stop_sequence,
+            literal(len(service_dates)).label('branch'),
+            # Within one service day the effective arrival order is the arrival_secs order
+            func.row_number().over(partition_by=StopTime.stop_id, order_by=StopTime.arrival_secs).label('rank'),
+        ).join(Trip).where(
+            StopTime.stop_id.in_(stop_ids),
+            StopTime.arrival_secs >= lo,
+            StopTime.arrival_secs < lo + window_secs,
+        )
+
+        services = active_service_ids(service_date)
+        if services is not None:
+            if not services:
+                continue
+            query = query.where(Trip.service_id.in_(services))
+        ranked.append(query.subquery())
+        service_dates.append(service_date)
+
+    if not ranked:
+        return results
+
+    kept = union_all(*[
+        select(sub.c.trip_id, sub.c.stop_id, sub.c.stop_sequence, sub.c.branch).where(sub.c.rank <= limit)
+        for sub in ranked
+    ]).subquery()
+    query = db.query(StopTime, kept.c.branch).join(kept, and_(
+        StopTime.trip_id == kept.c.trip_id,
+        StopTime.stop_id == kept.c.stop_id,
+        StopTime.stop_sequence == kept.c.stop_sequence,
+    )).join(Trip).options(contains_eager(StopTime.trip))
+
+    # A row can be in both branches only for windows of 24h or more; keep today's
+    seen = set()
+    for st, branch in sorted(query, key=lambda r: r[1]):
+        key = (st.trip_id, st.stop_id, st.stop_sequence)
+        if key not in seen:
+            seen.add(key)
+            results[st.stop_id].append((st, service_dates[branch]))
+
+    for stop_id, rows in results.items():
+        rows.sort(key=lambda r: (r[1] - today).days * SECONDS_PER_DAY + r[0].arrival_secs)
+        del rows[limit:]
+    return results
+
+def time_features(service_date: datetime.date, arrival_secs: int) -> dict:
+    """Calendar features (as used in training) for a scheduled arrival."""
+    day = service_date + datetime.timedelta(days=arrival_secs // SECONDS_PER_DAY)
+    return {
+        'hour_of_day': (arrival_secs % SECONDS_PER_DAY) // 3600,
+        'day_of_week': day.weekday(), # 0=Monday
+        'is_weekend': int(day.weekday() >= 5)
+    }
@@ -0,0 +1,107 @@
+"""
+Service calendar index: which service_ids, and so which trips, run on a date.
+
+calendar.txt is kept per service_id as a weekday mask and a date range, and
+calendar_dates.txt as per-date sets of added / removed services, so the index is
+sized by the feed's rows, not by the length of its date range (open-ended
+end_dates such as 20991231 are common). A day's active set is computed on first
+use and memoized; checking a single trip is a dict lookup and a range test.
+Rebuilt per static feed version.
+"""
+import datetime
+from typing import Optional
+import redis
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.gtfs import ServiceCalendar, CalendarDate, Trip
+from app.services.static_feed import VersionedCache
+
+WEEKDAY_COLUMNS = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
+EMPTY = frozenset()
+# Days whose active set is memoized; lookups cluster around today, so this is a
+# safety bound rather than a working-set size
+ACTIVE_CACHE_DAYS = 64
+
+class ServiceCalendarIndex:
+    """
+    calendars: (service_id, [7 weekday flags, Monday first], start_date, end_date) rows
+    exceptions: (service_id, date, exception_type) rows; 1 = added, 2 = removed
+    trip_services: {trip_id: service_id}
+    """
+    def __init__(self, calendars: list, exceptions: list, trip_services: dict):
+        self.has_calendar = bool(calendars or exceptions)
+        self.trip_services = trip_services
+        self.weekly = {} # service_id -> [(weekday bitmask, start_date, end_date)]
+        self.added = {} # date -> {service_id}
+        self.removed = {} # date -> {service_id}
+        self._active_by_date = {}
+
+        for service_id, weekdays, start, end in calendars:
+            mask = sum(1 << day for day, runs in enumerate(weekdays) if runs)
+            self.weekly.setdefault(service_id, []).append((mask, start, end))
+
+        for service_id, date, exception_type in exceptions:
+            if exception_type == 1:
+                self.added.setdefault(date, set()).add(service_id)
+            elif exception_type == 2:
+                self.removed.setdefault(date, set()).add(service_id)
+
+    def _runs_weekly(self, service_id: str, service_date: datetime.date) -> bool:
+        weekday = service_date.weekday()
+        return any(
+            start <= service_date <= end and mask >> weekday & 1
+            for mask, start, end in self.weekly.get(service_id, ())
+        )
+
+    def active_on(self, service_date: datetime.date) -> Optional[frozenset]:
+        """
+        Service IDs running on a date. None when the feed has no calendar at all
+        (callers should not filter then).
+        """
+        if not self.has_calendar:
+            return None
+        active = self._active_by_date.get(service_date)
+        if active is None:
+            removed = self.removed.get(service_date, EMPTY)
+            active = frozenset(
+                sid for sid in self.weekly if sid not in removed and self._runs_weekly(sid, service_date)
+            ) | self.added.get(service_date, EMPTY)
+            if len(self._active_by_date) >= ACTIVE_CACHE_DAYS:
+                self._active_by_date = {}
+            self._active_by_date[service_date] = active
+        return active
+
+    def service_runs_on(self, service_id: str, service_date: datetime.date) -> bool:
+        if not self.has_calendar:
+            return True
+        if service_id in self.added.get(service_date, EMPTY):
+            return True
+        if service_id in self.removed.get(service_date, EMPTY):
+            return False
+        return self._runs_weekly(service_id, service_date)
+
+    def trip_runs_on(self, trip_id: str, service_date: datetime.date) -> bool:
+        """Trips missing from the static feed (e.g. added in real time) are assumed to run."""
+        service_id = self.trip_services.get(trip_id)
+        if service_id is None:
+            return True
+        return self.service_runs_on(service_id, service_date)
+
+def load_service_calendar() -> ServiceCalendarIndex:
+    db = SessionLocal()
+    try:
+        calendars = [
+            (row.service_id, [getattr(row, day) for day in WEEKDAY_COLUMNS], row.start_date, row.end_date)
+            for row in db.query(ServiceCalendar)
+        ]
+        exceptions = db.query(CalendarDate.service_id, CalendarDate.date, CalendarDate.exception_type).all()
+        trip_services = dict(db.query(Trip.trip_id, Trip.service_id).all())
+    finally:
+        db.close()
+    index = ServiceCalendarIndex(calendars, exceptions, trip_services)
+    print(f"Service calendar loaded: {len(index.weekly)} weekly services, {len(exceptions)} exceptions")
+    return index
+
+redis_client = redis.Redis.from_url(settings.REDIS_URL, decode_responses=True)
+
+service_calendar = VersionedCache(load_service_calendar, redis_client)
@@ -0,0 +1,44 @@
+"""
+Read-through, in-process cache of the static GTFS entities served by the API
+(routes, stops and the stop search / nearby indexes built over them).
+
+Loaded from Postgres on first use and again whenever gtfs_loader publishes a
+new static feed version, so the endpoints that only read static data never
+need a DB connection.
+"""
+import json
+import redis
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.gtfs import Route, Stop
+from app.services.static_feed import VersionedCache
+from app.services.stop_geo_index import StopGeoIndex
+from app.services.stop_search import StopSearchIndex
+
+ROUTE_COLUMNS = (Route.route_id, Route.route_short_name, Route.route_long_name, Route.route_type, Route.route_color, Route.route_text_color)
+STOP_COLUMNS = (Stop.stop_id, Stop.stop_code, Stop.stop_name, Stop.stop_desc, Stop.stop_lat, Stop.stop_lon)
+
+class StaticGTFSData:
+    """One immutable snapshot of the static feed; swapped whole on reload."""
+    def __init__(self, routes: list, stops: list):
+        self.routes = routes
+        self.routes_by_id = {r['route_id']: r for r in routes}
+        self.routes_json = json.dumps(routes) # GET /routes body, serialized once per feed version
+        self.stops = stops
+        self.stops_by_id = {s['stop_id']: s for s in stops}
+        self.stop_search = StopSearchIndex(stops)
+        self.stop_geo = StopGeoIndex(stops)
+
+def load_static_gtfs() -> StaticGTFSData:
+    db = SessionLocal()
+    try:
+        routes = [dict(row._mapping) for row in db.query(*ROUTE_COLUMNS).order_by(Route.route_id)]
+        stops = [dict(row._mapping) for row in db.query(*STOP_COLUMNS).order_by(Stop.stop_id)]
+    finally:
+        db.close()
+    print(f"Static GTFS cache loaded: {len(routes)} routes, {len(stops)} stops")
+    return StaticGTFSData(routes, stops)
+
+redis_client = redis.Redis.from_url(settings.REDIS_URL, decode_responses=True)
+
+static_gtfs = VersionedCache(load_static_gtfs, redis_client)
@@ -0,0 +1,72 @@
+"""
+Static GTFS feed version tracking.
+
+gtfs_loader bumps gtfs_static:version in Redis after every load. In-process
+structures derived from the static feed (search indexes, caches) are wrapped in
+VersionedCache so each API worker rebuilds them when the version changes.
+"""
+import threading
+import time
+import uuid
+
+STATIC_VERSION_KEY = "gtfs_static:version"
+VERSION_CHECK_INTERVAL_SECONDS = 5.0
+
+def bump_static_version(redis_client) -> str:
+    version = uuid.uuid4().hex[:12]
+    redis_client.set(STATIC_VERSION_KEY, version)
+    return version
+
+def get_static_version(redis_client):
+    try:
+        return redis_client.get(STATIC_VERSION_KEY)
+    except Exception as e:
+        # Keep serving what we have rather than failing requests
+        print(f"Could not read static feed version: {e}")
+        return None
+
+class VersionedCache:
+    """
+    Lazily builds a value with `build()` and rebuilds it when the static feed
+    version changes. The version is checked at most every `check_interval`
+    seconds, so a hot path costs one Redis GET per interval, not per request.
+    """
+    def __init__(self, build, redis_client, check_interval: float = VERSION_CHECK_INTERVAL_SECONDS):
+        self._build = build
+        self._redis = redis_client
+        self._check_interval = check_interval
+        self._lock = threading.Lock()
+        self._current = None # (value, version), swapped as one so readers never mix them
+        self._checked_at = 0.0
+
+    def get(self):
+        return self.get_versioned()[0]
+
+    def get_versioned(self) -> tuple:
+        """
+        Returns (value, static feed version the value was built from). While one
+        thread checks the version or rebuilds, the others keep getting the value
+        they already have; only the very first build makes callers wait.
+        """
+        now = time.monotonic()
+        current = self._current
+        if current is not None and now - self._checked_at < self._check_interval:
+            return current
+
+        if not self._lock.acquire(blocking=current is None):
+            return current # refresh in progress in another thread: serve the stale value
+        try:
+            if self._current is not None and now - self._checked_at < self._check_interval:
+                return self._current # another thread refreshed while we waited
+
+            version = get_static_version(self._redis)
+            if self._current is None or (version is not None and version != self._current[1]):
+                self._current = (self._build(), version)
+            self._checked_at = time.monotonic()
+            return self._current
+        finally:
+            self._lock.release()
+
+    def invalidate(self):
+        with self._lock:
+            self._current = None
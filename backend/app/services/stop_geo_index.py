@@ -0,0 +1,65 @@
+"""
+In-process spatial index for nearest-stop queries.
+
+A uniform grid over the stops (cells of roughly CELL_SIZE_M meters): a lookup
+only measures the stops in the cells overlapping the search circle, then
+returns them sorted by great-circle distance.
+"""
+import heapq
+import math
+
+EARTH_RADIUS_M = 6_371_008.8
+METERS_PER_DEGREE_LAT = 111_320.0
+CELL_SIZE_M = 250.0
+
+def haversine_m(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(math.sqrt(a))
+
+class StopGeoIndex:
+    def __init__(self, stops: list, cell_size_m: float = CELL_SIZE_M):
+        """
+        stops: list of dicts with at least stop_lat and stop_lon. Stops without
+        coordinates (GTFS allows blank lat/lon for generic nodes and boarding
+        areas) are left out of the index.
+        """
+        self.stops = stops = [s for s in stops if s['stop_lat'] is not None and s['stop_lon'] is not None]
+        self._cell_lat = cell_size_m / METERS_PER_DEGREE_LAT
+
+        # Longitude cells are sized at the feed's mean latitude (a transit feed
+        # spans a few km, so the scale is effectively constant across it)
+        mean_lat = sum(s['stop_lat'] for s in stops) / len(stops) if stops else 0.0
+        self._lon_scale = max(math.cos(math.radians(mean_lat)), 0.01)
+        self._cell_lon = self._cell_lat / self._lon_scale
+
+        self._cells = {}
+        for i, s in enumerate(stops):
+            self._cells.setdefault(self._cell(s['stop_lat'], s['stop_lon']), []).append(i)
+
+    def __len__(self):
+        return len(self.stops)
+
+    def _cell(self, lat: float, lon: float) -> tuple:
+        return (math.floor(lat / self._cell_lat), math.floor(lon / self._cell_lon))
+
+    def nearby(self, lat: float, lon: float, radius_m: float, limit: int = 20) -> list:
+        """Returns up to `limit` (distance_m, stop) pairs within radius_m, nearest first."""
+        dlat = radius_m / METERS_PER_DEGREE_LAT
+        # Cover the circle's bounding box at the query latitude (wider than the cells assume near the poles)
+        dlon = dlat / max(math.cos(math.radians(lat)), 0.01)
+        lat_lo, lon_lo = self._cell(lat - dlat, lon - dlon)
+        lat_hi, lon_hi = self._cell(lat + dlat, lon + dlon)
+
+        hits = []
+        for cy in range(lat_lo, lat_hi + 1):
+            for cx in range(lon_lo, lon_hi + 1):
+                for i in self._cells.get((cy, cx), ()):
+                    s = self.stops[i]
+                    d = haversine_m(lat, lon, s['stop_lat'], s['stop_lon'])
+                    if d <= radius_m:
+                        hits.append((d, i))
+
+        return [(d, self.stops[i]) for d, i in heapq.nsmallest(limit, hits)]
@@ -0,0 +1,156 @@
+"""
+In-process type-ahead index over stop names and codes.
+
+Built once from the static GTFS stops (and rebuilt when a new feed is loaded),
+so search never touches Postgres. Ranking:
+    0. stop_code equals the query
+    1. stop_code / stop_name starts with the query
+    2. a word of stop_name starts with the query
+    3. fuzzy match (trigram similarity)
+then by trigram similarity within a tier, then by name.
+"""
+import bisect
+import heapq
+import re
+from collections import Counter
+
+_NON_ALNUM = re.compile(r"[^0-9a-z]+")
+_WORD_STARTS = re.compile(r"(?<= )[0-9a-z]")
+
+# Cap on prefix hits gathered per tier before ranking (short queries like "s"
+# can prefix-match a large share of the feed)
+MAX_PREFIX_CANDIDATES = 500
+# Minimum trigram similarity for a fuzzy-only match
+MIN_SIMILARITY = 0.3
+# Most similar names kept by the fuzzy tier
+MAX_FUZZY_CANDIDATES = 100
+# Fuzzy matching is skipped for shorter queries (too few trigrams to tell typos apart)
+MIN_FUZZY_QUERY_LENGTH = 4
+# Trigrams in more than this share of the stop names don't narrow the fuzzy candidates
+# down, so they are not used to find them (they still count in the similarity)
+MAX_TRIGRAM_DOC_FRACTION = 0.05
+
+def normalize(text) -> str:
+    return _NON_ALNUM.sub(" ", str(text or "").lower()).strip()
+
+def trigrams(normalized: str) -> set:
+    """pg_trgm-style trigrams: each word padded with two leading and one trailing space."""
+    grams = set()
+    for word in normalized.split():
+        padded = f"  {word} "
+        for i in range(len(padded) - 2):
+            grams.add(padded[i:i + 3])
+    return grams
+
+class StopSearchIndex:
+    def __init__(self, stops: list):
+        """stops: list of dicts with at least stop_id, stop_name, stop_code."""
+        self.stops = stops
+        self._names = [normalize(s['stop_name']) for s in stops]
+        self._codes = [normalize(s.get('stop_code')) for s in stops]
+        # Trigrams and postings are per distinct name (both directions of a street
+        # corner usually share one), so the fuzzy tier scores each name once
+        name_ids = {}
+        self._name_ids = [name_ids.setdefault(name, len(name_ids)) for name in self._names]
+        self._stops_by_name = [[] for _ in name_ids]
+        for i, name_id in enumerate(self._name_ids):
+            self._stops_by_name[name_id].append(i)
+        self._trigrams = [trigrams(name) for name in name_ids]
+        self._trigram_counts = [len(grams) for grams in self._trigrams]
+
+        # Sorted (key, position) lists for prefix lookups by bisect
+        self._name_prefix = sorted((name, i) for i, name in enumerate(self._names) if name)
+        self._code_prefix = sorted((code, i) for i, code in enumerate(self._codes) if code)
+        # Name suffixes starting at each later word, so "transit c" finds "Main Transit Center"
+        self._word_prefix = sorted(
+            (name[m.start():], i) for i, name in enumerate(self._names) for m in _WORD_STARTS.finditer(name)
+        )
+
+        self._postings = {} # trigram -> name ids
+        for name_id, grams in enumerate(self._trigrams):
+            for gram in grams:
+                self._postings.setdefault(gram, []).append(name_id)
+
+    def __len__(self):
+        return len(self.stops)
+
+    @staticmethod
+    def _prefix_hits(sorted_keys: list, prefix: str) -> list:
+        hits = []
+        start = bisect.bisect_left(sorted_keys, (prefix,))
+        for key, i in sorted_keys[start:start + MAX_PREFIX_CANDIDATES]:
+            if not key.startswith(prefix):
+                break
+            hits.append(i)
+        return hits
+
+    def _similarity(self, q_grams: set, name_id: int) -> float:
+        grams = self._trigrams[name_id]
+        shared = len(q_grams & grams)
+        return shared / (len(q_grams) + len(grams) - shared) if shared else 0.0
+
+    def _fuzzy_matches(self, q_grams: set) -> dict:
+        """{name id: trigram similarity} for the MAX_FUZZY_CANDIDATES names most similar to the query."""
+        # A row reaching MIN_SIMILARITY shares at least min_shared trigrams with the query,
+        # so it must appear in one of the (n - min_shared + 1) rarest posting lists.
+        # Of those, the ones above MAX_TRIGRAM_DOC_FRACTION are not searched (the rarest
+        # always is); like the rest, they only add to the counts of names already found.
+        min_shared = max(1, int(len(q_grams) * MIN_SIMILARITY))
+        postings = sorted((self._postings[gram] for gram in q_grams if gram in self._postings), key=len)
+        max_postings = max(1, int(len(self._trigrams) * MAX_TRIGRAM_DOC_FRACTION))
+        searched = {
+            j for j, names in enumerate(postings[:len(q_grams) - min_shared + 1]) if j == 0 or len(names) <= max_postings
+        }
+
+        counts = Counter()
+        for j in searched:
+            counts.update(postings[j])
+        found = set(counts)
+        for j, names in enumerate(postings):
+            if j not in searched:
+                counts.update(found.intersection(names))
+
+        # The shared trigram counts are exact now, so the similarity follows from them
+        n = len(q_grams)
+        sizes = self._trigram_counts
+        similarity = {name_id: shared / (n + sizes[name_id] - shared) for name_id, shared in counts.items()}
+        best = heapq.nlargest(MAX_FUZZY_CANDIDATES, similarity, key=similarity.get)
+        return {name_id: similarity[name_id] for name_id in best}
+
+    def search(self, q: str, limit: int = 10) -> list:
+        """Returns up to `limit` stop dicts, best match first."""
+        q_norm = normalize(q)
+        if not q_norm:
+            return []
+
+        tiers = {} # position -> best (lowest) tier
+        def offer(i, tier):
+            if tier < tiers.get(i, 4):
+                tiers[i] = tier
+
+        for i in self._prefix_hits(self._code_prefix, q_norm):
+            offer(i, 0 if self._codes[i] == q_norm else 1)
+        for i in self._prefix_hits(self._name_prefix, q_norm):
+            offer(i, 1)
+        # Lower tiers only matter if the higher ones leave room in the result
+        if len(tiers) < limit:
+            for i in self._prefix_hits(self._word_prefix, q_norm):
+                offer(i, 2)
+
+        q_grams = trigrams(q_norm)
+        similarity = {} # name id -> trigram similarity to the query
+        if len(tiers) < limit and len(q_norm) >= MIN_FUZZY_QUERY_LENGTH:
+            similarity = self._fuzzy_matches(q_grams)
+            for name_id, sim in similarity.items():
+                if sim >= MIN_SIMILARITY or q_norm in self._names[self._stops_by_name[name_id][0]]:
+                    for i in self._stops_by_name[name_id]:
+                        offer(i, 3)
+
+        def rank(i):
+            name_id = self._name_ids[i]
+            if name_id not in similarity:
+                similarity[name_id] = self._similarity(q_grams, name_id)
+            return tiers[i], -similarity[name_id], self._names[i]
+
+        ranked = sorted(tiers, key=rank)
+        return [self.stops[i] for i in ranked[:limit]]
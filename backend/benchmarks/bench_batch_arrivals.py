@@ -0,0 +1,72 @@
+"""
+Benchmark: N single-stop arrivals computations vs one multi-stop batch.
+
+Runs against the configured DATABASE_URL / REDIS_URL (needs a loaded GTFS feed).
+Uses the busiest stops so every call has real rows to merge and score.
+
+Usage (from backend/):
+    python -m benchmarks.bench_batch_arrivals --stops 10,40
+"""
+import argparse
+import statistics
+import time
+
+import redis
+from sqlalchemy import func
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.gtfs import StopTime
+from app.services.arrivals import build_stop_arrivals, build_arrivals_for_stops
+from app.services.schedule import agency_now
+
+
+def busiest_stops(db, n: int) -> list:
+    rows = db.query(StopTime.stop_id).group_by(StopTime.stop_id).order_by(func.count().desc()).limit(n).all()
+    return [stop_id for (stop_id,) in rows]
+
+
+def time_call(fn, repeats: int) -> float:
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--stops", default="10,40")
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    redis_client = redis.Redis.from_url(settings.REDIS_URL, decode_responses=True)
+    db = SessionLocal()
+    try:
+        sizes = [int(s) for s in args.stops.split(",")]
+        stop_ids = busiest_stops(db, max(sizes))
+        now = agency_now()
+
+        print(f"{'stops':>6} {'N single ms':>12} {'batch ms':>10} {'speedup':>8}")
+        for n in sizes:
+            batch_ids = stop_ids[:n]
+
+            def singles():
+                for stop_id in batch_ids:
+                    build_stop_arrivals(db, redis_client, stop_id, now)
+                    db.expunge_all()
+
+            def batch():
+                build_arrivals_for_stops(db, redis_client, batch_ids, now)
+                db.expunge_all()
+
+            single_ms = time_call(singles, args.repeats)
+            batch_ms = time_call(batch, args.repeats)
+            print(f"{len(batch_ids):>6} {single_ms:>12.2f} {batch_ms:>10.2f} {single_ms / batch_ms:>7.1f}x")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
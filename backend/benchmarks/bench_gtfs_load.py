@@ -0,0 +1,60 @@
+"""
+Benchmark: wall-clock time to load a static GTFS feed with the COPY path (serial
+and across --workers processes) vs the original row-by-row ORM path, on a
+synthetic feed with 1M stop_times.
+
+Needs a scratch database (DATABASE_URL): trips and stop_times are truncated
+before each run so both methods load into the same empty tables.
+
+Usage (from backend/):
+    python -m benchmarks.bench_gtfs_load --trips 25000 --stops-per-trip 40 --methods copy,orm --workers 1,4,16
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from app.db.session import engine
+from app.services.gtfs_loader import load_gtfs_static
+from benchmarks.synthetic_gtfs import write_feed
+
+def truncate_schedule():
+    conn = engine.raw_connection()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("TRUNCATE stop_times, trips")
+        conn.commit()
+    finally:
+        conn.close()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--trips", type=int, default=25000)
+    parser.add_argument("--stops-per-trip", type=int, default=40)
+    parser.add_argument("--methods", default="copy,orm")
+    parser.add_argument("--workers", default="1,4", help="Worker counts to try for the copy method")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "gtfs.zip")
+        n = write_feed(path, args.trips, args.stops_per_trip)
+        print(f"Synthetic feed: {args.trips} trips, {n} stop_times")
+
+        runs = []
+        for method in args.methods.split(","):
+            counts = [int(w) for w in args.workers.split(",")] if method == "copy" else [1]
+            runs.extend((method, workers) for workers in counts)
+
+        results = []
+        for method, workers in runs:
+            truncate_schedule()
+            start = time.perf_counter()
+            load_gtfs_static(gtfs_zip=path, method=method, full=True, workers=workers)
+            results.append((method, workers, time.perf_counter() - start))
+
+    print(f"{'method':>8} {'workers':>8} {'seconds':>9} {'rows/s':>10}")
+    for method, workers, seconds in results:
+        print(f"{method:>8} {workers:>8} {seconds:>9.1f} {n / seconds:>10.0f}")
+
+if __name__ == "__main__":
+    main()
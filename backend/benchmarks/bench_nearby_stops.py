@@ -0,0 +1,75 @@
+"""
+Benchmark: p50/p99 nearest-stop lookup latency of the grid index vs a linear
+scan, on synthetic feeds of 10k and 100k stops spread over a metro area.
+
+Usage (from backend/):
+    python -m benchmarks.bench_nearby_stops --stops 10000,100000 --radius-m 500
+"""
+import argparse
+import random
+import time
+
+from app.services.stop_geo_index import StopGeoIndex, haversine_m
+
+CENTER_LAT, CENTER_LON = 40.4842, -88.9937
+SPAN_DEG = 0.3 # ~33 km x 25 km
+
+def make_stops(n: int, rng: random.Random) -> list:
+    return [
+        {
+            'stop_id': str(i),
+            'stop_name': f"Stop {i}",
+            'stop_lat': CENTER_LAT + (rng.random() - 0.5) * SPAN_DEG,
+            'stop_lon': CENTER_LON + (rng.random() - 0.5) * SPAN_DEG,
+        }
+        for i in range(n)
+    ]
+
+def linear_nearby(stops: list, lat: float, lon: float, radius_m: float, limit: int) -> list:
+    hits = [(haversine_m(lat, lon, s['stop_lat'], s['stop_lon']), s) for s in stops]
+    return sorted((h for h in hits if h[0] <= radius_m), key=lambda h: h[0])[:limit]
+
+def percentile(values: list, pct: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct))]
+
+def measure(fn, points: list) -> list:
+    timings = []
+    for lat, lon in points:
+        start = time.perf_counter()
+        fn(lat, lon)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--stops", default="10000,100000")
+    parser.add_argument("--radius-m", type=float, default=500)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--linear-queries", type=int, default=50)
+    args = parser.parse_args()
+
+    rng = random.Random(11)
+    print(f"{'stops':>7} {'method':>8} {'p50 ms':>8} {'p99 ms':>8}")
+    for n in [int(s) for s in args.stops.split(",")]:
+        stops = make_stops(n, rng)
+        index = StopGeoIndex(stops)
+        points = [
+            (CENTER_LAT + (rng.random() - 0.5) * SPAN_DEG, CENTER_LON + (rng.random() - 0.5) * SPAN_DEG)
+            for _ in range(args.queries)
+        ]
+
+        # Sanity checks: stops without coordinates (GTFS nodes, boarding areas) are
+        # skipped, and the answer is the same as the brute-force scan
+        assert len(StopGeoIndex(stops + [{'stop_id': 'node', 'stop_name': "Node", 'stop_lat': None, 'stop_lon': None}])) == n
+        lat, lon = points[0]
+        expected = [s['stop_id'] for _, s in linear_nearby(stops, lat, lon, args.radius_m, 20)]
+        assert [s['stop_id'] for _, s in index.nearby(lat, lon, args.radius_m, 20)] == expected
+
+        grid = measure(lambda lat, lon: index.nearby(lat, lon, args.radius_m, 20), points)
+        linear = measure(lambda lat, lon: linear_nearby(stops, lat, lon, args.radius_m, 20), points[:args.linear_queries])
+        for name, timings in [("grid", grid), ("linear", linear)]:
+            print(f"{n:>7} {name:>8} {percentile(timings, 0.5):>8.3f} {percentile(timings, 0.99):>8.3f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Benchmark: per-row predict() vs batched predict_many().
+
+Usage (from backend/):
+    python -m benchmarks.bench_predict_many
+    python -m benchmarks.bench_predict_many --model ../ml/models/delay_predictor_v1.joblib
+"""
+import argparse
+import os
+import random
+import statistics
+import time
+
+import joblib
+
+from app.services.prediction import PredictionService, MODEL_PATH
+
+LOCAL_MODEL_PATH = os.path.join(os.path.dirname(__file__), "..", "..", "ml", "models", "delay_predictor_v1.joblib")
+
+
+def make_features(n: int) -> list:
+    rng = random.Random(42)
+    return [
+        {
+            'route_id': rng.choice(['101', 'Red', 'Green', 'Blue']),
+            'stop_sequence': rng.randint(1, 40),
+            'hour_of_day': rng.randint(5, 23),
+            'day_of_week': rng.randint(0, 6),
+            'is_weekend': rng.choice([0, 1]),
+        }
+        for _ in range(n)
+    ]
+
+
+def time_call(fn, repeats: int) -> list:
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default=MODEL_PATH if os.path.exists(MODEL_PATH) else LOCAL_MODEL_PATH)
+    parser.add_argument("--sizes", default="50,500")
+    parser.add_argument("--repeats", type=int, default=10)
+    args = parser.parse_args()
+
+    service = PredictionService()
+    service.model = joblib.load(args.model)
+
+    print(f"{'rows':>6} {'per-row ms':>12} {'batched ms':>12} {'speedup':>8}")
+    for n in [int(s) for s in args.sizes.split(",")]:
+        features = make_features(n)
+        per_row = time_call(lambda: [service.predict(f) for f in features], args.repeats)
+        batched = time_call(lambda: service.predict_many(features), args.repeats)
+        per_row_ms = statistics.median(per_row)
+        batched_ms = statistics.median(batched)
+        print(f"{n:>6} {per_row_ms:>12.2f} {batched_ms:>12.2f} {per_row_ms / batched_ms:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Benchmark: GTFS-RT trip-updates decode, per-entity dicts vs the columnar parser,
+alone and together with queuing the Redis writes, on a generated feed
+(default 5k trips x 40 stop_time_updates).
+
+Usage (from backend/):
+    python -m benchmarks.bench_rt_parse --trips 5000 --stops 40
+"""
+import argparse
+import json
+import statistics
+import time
+
+from google.transit import gtfs_realtime_pb2
+
+from app.services.gtfs_rt import parse_trip_updates, parse_trip_updates_columnar
+from app.services.rt_cache import RT_TTL_SECONDS, cache_trip_update_columns, trip_delays_key
+
+class NullPipeline:
+    """Accepts pipeline commands and drops them, so only the caller's own work is timed."""
+    def set(self, *args, **kwargs): pass
+    def delete(self, *args): pass
+    def hset(self, *args, **kwargs): pass
+    def expire(self, *args): pass
+
+def cache_trip_update(pipe, update: dict):
+    """Baseline: the old per-trip writes, a JSON document plus the delays index."""
+    trip_id = update['trip_id']
+    pipe.set(f"trip_update:{trip_id}", json.dumps(update), ex=RT_TTL_SECONDS)
+
+    delays = {}
+    for stu in update['stop_time_updates']:
+        delays.setdefault(stu['stop_sequence'], stu.get('arrival_delay') or 0)
+
+    key = trip_delays_key(trip_id)
+    pipe.delete(key)
+    if delays:
+        pipe.hset(key, mapping=delays)
+        pipe.expire(key, RT_TTL_SECONDS)
+
+def make_feed(trips: int, stops: int) -> bytes:
+    feed = gtfs_realtime_pb2.FeedMessage()
+    feed.header.gtfs_realtime_version = "2.0"
+    feed.header.timestamp = int(time.time())
+    for t in range(trips):
+        entity = feed.entity.add()
+        entity.id = f"tu-{t}"
+        tu = entity.trip_update
+        tu.trip.trip_id = f"T{t}"
+        tu.trip.route_id = f"R{t % 60}"
+        tu.vehicle.id = f"V{t}"
+        tu.timestamp = feed.header.timestamp
+        for seq in range(1, stops + 1):
+            stu = tu.stop_time_update.add()
+            stu.stop_sequence = seq
+            stu.stop_id = f"S{(t * 7 + seq) % 4000}"
+            stu.arrival.delay = (t + seq) % 600 - 60
+            stu.arrival.time = feed.header.timestamp + seq * 90
+            stu.departure.delay = stu.arrival.delay
+            stu.departure.time = stu.arrival.time + 20
+    return feed.SerializeToString()
+
+def time_call(fn, repeats: int) -> float:
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--trips", type=int, default=5000)
+    parser.add_argument("--stops", type=int, default=40)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    content = make_feed(args.trips, args.stops)
+    feed = gtfs_realtime_pb2.FeedMessage()
+    feed.ParseFromString(content)
+    pipe = NullPipeline()
+    print(f"Feed: {args.trips} trips x {args.stops} stops, {len(content) / 1e6:.1f} MB")
+
+    # Sanity check: both parsers yield the same delay index
+    updates = parse_trip_updates(feed)
+    columns = parse_trip_updates_columnar(feed)
+    assert columns.trip_ids == [u['trip_id'] for u in updates]
+    assert columns.delays(0) == {s['stop_sequence']: s['arrival_delay'] for s in updates[0]['stop_time_updates']}
+
+    def dict_ingest():
+        for u in parse_trip_updates(feed):
+            cache_trip_update(pipe, u)
+
+    def columnar_ingest():
+        cache_trip_update_columns(pipe, parse_trip_updates_columnar(feed), {})
+
+    cases = [
+        ("protobuf ParseFromString", lambda: gtfs_realtime_pb2.FeedMessage().ParseFromString(content)),
+        ("dict parse", lambda: parse_trip_updates(feed)),
+        ("columnar parse", lambda: parse_trip_updates_columnar(feed)),
+        ("dict parse + queue writes", dict_ingest),
+        ("columnar parse + queue writes", columnar_ingest),
+    ]
+    print(f"{'case':<32} {'median ms':>10}")
+    for name, fn in cases:
+        print(f"{name:<32} {time_call(fn, args.repeats):>10.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Benchmark: in-process stop search index vs a linear substring scan
+(what `stop_name ILIKE '%q%'` does) on a synthetic feed.
+
+Usage (from backend/):
+    python -m benchmarks.bench_stop_search --stops 50000
+"""
+import argparse
+import random
+import statistics
+import time
+
+from app.services.stop_search import StopSearchIndex, normalize
+
+STREETS = [
+    "Main", "Oak", "Maple", "College", "Washington", "Lincoln", "Veterans", "Vernon",
+    "Linden", "Beaufort", "Franklin", "Jefferson", "Market", "Hershey", "Empire", "Clinton",
+    "Locust", "Walnut", "Chestnut", "Grove", "Division", "Towanda", "Airport", "Fort Jesse",
+]
+SUFFIXES = ["St", "Ave", "Rd", "Blvd", "Dr", "Pkwy"]
+PLACES = ["Transit Center", "Hospital", "Mall", "High School", "Library", "Park", "Station"]
+
+def make_stops(n: int) -> list:
+    rng = random.Random(7)
+    stops = []
+    for i in range(n):
+        if rng.random() < 0.8:
+            a, b = rng.sample(STREETS, 2)
+            name = f"{a} {rng.choice(SUFFIXES)} & {b} {rng.choice(SUFFIXES)}"
+        else:
+            name = f"{rng.choice(STREETS)} {rng.choice(PLACES)} {rng.choice(['North', 'South', 'East', 'West', ''])}".strip()
+        stops.append({
+            'stop_id': str(i),
+            'stop_code': str(10000 + i),
+            'stop_name': name,
+            'stop_desc': None,
+            'stop_lat': 40.48 + rng.random() * 0.1,
+            'stop_lon': -89.02 + rng.random() * 0.1,
+        })
+    return stops
+
+def linear_scan(stops: list, names: list, q: str, limit: int = 10) -> list:
+    q_norm = normalize(q)
+    return [stop for stop, name in zip(stops, names) if q_norm in name][:limit]
+
+def percentile(values: list, pct: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct))]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--stops", type=int, default=50000)
+    parser.add_argument("--rounds", type=int, default=5, help="times each query is run")
+    args = parser.parse_args()
+
+    stops = make_stops(args.stops)
+    start = time.perf_counter()
+    index = StopSearchIndex(stops)
+    print(f"Built index over {len(index)} stops in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    # Type-ahead: every prefix of a few queries, plus typos and codes
+    queries = []
+    for word in ["washington", "college ave", "transit center", "veterns pkwy", "10042", "hersey"]:
+        queries.extend(word[:i] for i in range(1, len(word) + 1))
+
+    names = [normalize(s['stop_name']) for s in stops]
+    for name, fn in [("index", lambda q: index.search(q)), ("linear scan", lambda q: linear_scan(stops, names, q))]:
+        timings = []
+        for q in queries * args.rounds:
+            start = time.perf_counter()
+            fn(q)
+            timings.append((time.perf_counter() - start) * 1000)
+        print(f"{name:>12}: median {statistics.median(timings):7.3f} ms   p99 {percentile(timings, 0.99):7.3f} ms   ({len(timings)} queries)")
+
+    print("Top results for 'veterns pkwy':", [s['stop_name'] for s in index.search("veterns pkwy", 3)])
+
+if __name__ == "__main__":
+    main()
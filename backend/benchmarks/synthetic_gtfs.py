@@ -0,0 +1,63 @@
+"""
+Generates a synthetic static GTFS zip of a chosen size for loader benchmarks.
+
+    python -m benchmarks.synthetic_gtfs /tmp/feed.zip --trips 25000 --stops-per-trip 40
+"""
+import argparse
+import csv
+import io
+import random
+import zipfile
+
+def write_feed(path: str, trips: int = 25000, stops_per_trip: int = 40, stops: int = 5000, routes: int = 50, seed: int = 3):
+    """Writes a feed with trips * stops_per_trip stop_times. Returns the stop_times count."""
+    rng = random.Random(seed)
+
+    def table(z, name, header, rows):
+        buf = io.StringIO()
+        writer = csv.writer(buf)
+        writer.writerow(header)
+        writer.writerows(rows)
+        z.writestr(name, buf.getvalue())
+
+    with zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED) as z:
+        table(z, "agency.txt", ["agency_id", "agency_name", "agency_url", "agency_timezone"],
+              [["1", "Synthetic Transit", "https://example.com", "America/Chicago"]])
+        table(z, "routes.txt", ["route_id", "route_short_name", "route_long_name", "route_type", "route_color", "route_text_color"],
+              [[f"R{r}", str(r), f"Route {r}", 3, "0055AA", "FFFFFF"] for r in range(routes)])
+        table(z, "stops.txt", ["stop_id", "stop_code", "stop_name", "stop_desc", "stop_lat", "stop_lon"],
+              [[f"S{s}", str(10000 + s), f"Stop {s}", "", f"{40.4 + rng.random() * 0.2:.6f}", f"{-89.1 + rng.random() * 0.2:.6f}"]
+               for s in range(stops)])
+        table(z, "calendar.txt", ["service_id", "monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday", "start_date", "end_date"],
+              [["WK", 1, 1, 1, 1, 1, 0, 0, "20260101", "20271231"], ["WE", 0, 0, 0, 0, 0, 1, 1, "20260101", "20271231"]])
+        table(z, "calendar_dates.txt", ["service_id", "date", "exception_type"],
+              [["WK", "20261126", 2], ["WE", "20261126", 1]])
+        table(z, "trips.txt", ["route_id", "service_id", "trip_id", "trip_headsign", "direction_id", "shape_id"],
+              [[f"R{t % routes}", "WK" if t % 4 else "WE", f"T{t}", f"Headsign {t % routes}", t % 2, f"SH{t % routes}"]
+               for t in range(trips)])
+
+        # stop_times is streamed into the archive rather than built in memory
+        with z.open("stop_times.txt", "w", force_zip64=True) as raw:
+            out = io.TextIOWrapper(raw, encoding="utf-8", newline="")
+            writer = csv.writer(out)
+            writer.writerow(["trip_id", "arrival_time", "departure_time", "stop_id", "stop_sequence"])
+            for t in range(trips):
+                secs = 5 * 3600 + (t * 37) % (20 * 3600) # trips start 05:00-25:00
+                first_stop = rng.randrange(stops)
+                for seq in range(1, stops_per_trip + 1):
+                    hhmmss = f"{secs // 3600:02d}:{secs % 3600 // 60:02d}:{secs % 60:02d}"
+                    writer.writerow([f"T{t}", hhmmss, hhmmss, f"S{(first_stop + seq) % stops}", seq])
+                    secs += 60 + rng.randrange(120)
+            out.flush()
+            out.detach()
+
+    return trips * stops_per_trip
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path")
+    parser.add_argument("--trips", type=int, default=25000)
+    parser.add_argument("--stops-per-trip", type=int, default=40)
+    args = parser.parse_args()
+    n = write_feed(args.path, args.trips, args.stops_per_trip)
+    print(f"Wrote {args.path} with {n} stop_times")
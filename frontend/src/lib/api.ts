@@ -40,3 +40,10 @@ export const getStopArrivals = async (stopId: string): Promise<Arrival[]> => {
     const response = await api.get(`/stops/${stopId}/arrivals`);
     return response.data;
 };
+
+export const getArrivalsForStops = async (stopIds: string[]): Promise<Record<string, Arrival[]>> => {
+    const params = new URLSearchParams();
+    stopIds.forEach((id) => params.append('stop_id', id));
+    const response = await api.get(`/arrivals?${params.toString()}`);
+    return response.data;
+};
@@ -1,15 +1,101 @@
+import argparse
+import datetime
 import pandas as pd
 import numpy as np
 import os
+import pyarrow as pa
+import pyarrow.compute as pc
 from sqlalchemy import create_engine
 from app.core.config import settings
+from app.services.rt_parquet import open_dataset
 
-def fetch_raw_data(limit=10000):
+# Final observed delay per trip, stop and (UTC) day: the last stop_time_update
+# archived for it (rt_trip_updates_raw, see app.services.rt_archive). Missing
+# route_id / stop_id in the feed are filled in from the static schedule.
+ARCHIVED_DELAYS_SQL = """
+SELECT DISTINCT ON (r.trip_id, r.stop_sequence, r.stop_id, r.feed_timestamp::date)
+    COALESCE(NULLIF(r.route_id, ''), t.route_id) AS route_id,
+    COALESCE(NULLIF(r.stop_id, ''), st.stop_id) AS stop_id,
+    COALESCE(NULLIF(r.stop_sequence, 0), st.stop_sequence) AS stop_sequence,
+    r.arrival_delay AS actual_delay_seconds,
+    r.feed_timestamp
+FROM rt_trip_updates_raw r
+LEFT JOIN trips t ON t.trip_id = r.trip_id
+LEFT JOIN stop_times st ON st.trip_id = r.trip_id
+    AND (st.stop_sequence = r.stop_sequence OR (r.stop_sequence = 0 AND st.stop_id = r.stop_id))
+WHERE r.feed_timestamp >= now() - make_interval(days => %(days)s)
+ORDER BY r.trip_id, r.stop_sequence, r.stop_id, r.feed_timestamp::date, r.feed_timestamp DESC
+LIMIT %(limit)s
+"""
+
+def add_time_features(df, utc_timestamps):
+    # Archive timestamps are UTC; features use the agency's local time
+    local = utc_timestamps.dt.tz_convert(settings.AGENCY_TIMEZONE)
+    df['hour_of_day'] = local.dt.hour
+    df['day_of_week'] = local.dt.dayofweek # 0=Monday
+    df['is_weekend'] = (df['day_of_week'] >= 5).astype(int)
+    df['late_5min'] = (df['actual_delay_seconds'] >= 300).astype(int)
+    return df
+
+def fetch_archived_delays(limit=10000, days=90):
+    """Labels from the real-time archive, or an empty frame if there is none (yet)."""
+    try:
+        engine = create_engine(settings.DATABASE_URL)
+        df = pd.read_sql_query(ARCHIVED_DELAYS_SQL, engine, params={'limit': limit, 'days': days})
+    except Exception as e:
+        print(f"Could not read the real-time archive: {e}")
+        return pd.DataFrame()
+    if df.empty:
+        return df
+    return add_time_features(df, pd.to_datetime(df.pop('feed_timestamp')).dt.tz_localize('UTC'))
+
+# Parquet snapshots hold every feed version, so the same (trip, stop) shows up in many
+# rows a day; only the last one per (UTC) day is a label.
+LABEL_KEYS = ['trip_id', 'stop_sequence', 'stop_id', 'date']
+PARQUET_COLUMNS = ['feed_timestamp', 'trip_id', 'route_id', 'stop_sequence', 'stop_id', 'arrival_delay', 'date']
+
+def last_per_key(table: pa.Table) -> pa.Table:
+    """Latest row (by feed_timestamp) of every LABEL_KEYS group."""
+    values = ['route_id', 'arrival_delay', 'feed_timestamp']
+    grouped = table.sort_by('feed_timestamp').group_by(LABEL_KEYS, use_threads=False).aggregate(
+        [(c, 'last') for c in values]
+    )
+    return pa.table({c: grouped[c] for c in LABEL_KEYS} | {c: grouped[f"{c}_last"] for c in values})
+
+def fetch_parquet_delays(root, limit=10000, days=90):
     """
-    Fetches raw trip updates and vehicle positions from DB.
-    For this MVP, we will simulate data if DB is empty.
+    Same labels as fetch_archived_delays(), from the Parquet snapshot dataset
+    (app.services.rt_parquet) instead of Postgres. Reads the last `days` days in
+    one scan, only the columns the labels need; most recent day first.
     """
-    # Real logic: Query rt_trip_updates_raw and join with gtfs static
+    dataset = open_dataset(root, 'trip_updates')
+    today = datetime.datetime.now(datetime.timezone.utc).date()
+    start = (today - datetime.timedelta(days=days)).isoformat()
+    # date is a directory partition: files of other days are never opened
+    table = dataset.to_table(
+        columns=PARQUET_COLUMNS, filter=(pc.field('date') >= start) & (pc.field('date') <= today.isoformat())
+    )
+    if not table.num_rows:
+        return pd.DataFrame()
+
+    labels = last_per_key(table).sort_by([('date', 'descending')]).slice(0, limit)
+    df = labels.to_pandas().rename(columns={'arrival_delay': 'actual_delay_seconds'}).drop(columns=['trip_id', 'date'])
+    return add_time_features(df, df.pop('feed_timestamp'))
+
+def fetch_raw_data(limit=10000, parquet_dir=None, days=90):
+    """
+    Fetches raw trip updates from the real-time archive (rt_trip_updates_raw), or
+    from the Parquet snapshot dataset under parquet_dir. Falls back to simulated
+    data while the archive is empty.
+    """
+    if parquet_dir:
+        df = fetch_parquet_delays(parquet_dir, limit, days)
+    else:
+        df = fetch_archived_delays(limit, days)
+    if not df.empty:
+        print(f"Loaded {len(df)} archived observations for training")
+        return df
+
     # Simulation for MVP:
     print("Generating synthetic data for training...")
     
@@ -38,7 +124,13 @@ def fetch_raw_data(limit=10000):
     return df
 
 if __name__ == "__main__":
-    df = fetch_raw_data()
+    parser = argparse.ArgumentParser(description="Builds ml/data/training_data.csv")
+    parser.add_argument("--parquet", help="read the GTFS-RT Parquet snapshots under this directory (RT_PARQUET_DIR) instead of Postgres")
+    parser.add_argument("--days", type=int, default=90, help="days of history to read")
+    parser.add_argument("--limit", type=int, default=10000, help="maximum number of samples")
+    args = parser.parse_args()
+
+    df = fetch_raw_data(args.limit, args.parquet, args.days)
     output_path = "ml/data/training_data.csv"
     os.makedirs(os.path.dirname(output_path), exist_ok=True)
     df.to_csv(output_path, index=False)
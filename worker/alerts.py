@@ -2,6 +2,8 @@ from tasks import app
 from app.db.session import SessionLocal
 from app.models.alerts import AlertSubscription, NotificationEvent
 from app.services.gtfs_rt import parse_trip_updates, fetch_feed, TRIP_UPDATES_URL
+from app.services.schedule import agency_now
+from app.services.service_calendar import service_calendar
 import datetime
 
 @app.on_after_configure.connect
@@ -29,11 +31,18 @@ def check_alerts():
         feed = fetch_feed(TRIP_UPDATES_URL)
         updates = parse_trip_updates(feed)
         
+        # Only trips running on today's (or, after midnight, yesterday's) service day
+        calendar = service_calendar.get()
+        today = agency_now().date()
+        service_days = (today, today - datetime.timedelta(days=1))
+
         # Index updates by route and vehicle for faster lookup (O(N) -> O(1))
         # Map: (route_id, stop_id) -> delay_seconds
         delays_map = {} 
         
         for u in updates:
+            if not any(calendar.trip_runs_on(u['trip_id'], day) for day in service_days):
+                continue
             route_id = u['route_id']
             for stu in u['stop_time_updates']:
                 stop_id = stu['stop_id']
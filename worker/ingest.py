@@ -1,65 +1,227 @@
-from celery.schedules import crontab
 from tasks import app
-from app.services.gtfs_rt import fetch_feed, parse_vehicle_positions, parse_trip_updates, VEHICLE_POSITIONS_URL, TRIP_UPDATES_URL
+from app.services.gtfs_rt import (
+    FeedClient, parse_vehicle_positions, parse_trip_updates_columnar, parse_alerts, VEHICLE_POSITIONS_URL, TRIP_UPDATES_URL, ALERTS_URL
+)
+from app.services.rt_cache import (
+    cache_trip_update_columns, cache_vehicles, cache_arrival_board, cache_vehicles_snapshot, cache_vehicle_indexes, cache_vehicle_changes, touch_vehicles_snapshot,
+    cache_service_alerts, feed_lock_key, VEHICLE_HASHES_KEY, TRIP_DELAYS_HASHES_KEY,
+    VEHICLE_ROUTES_KEY, VEHICLES_FINGERPRINTS_KEY, VEHICLES_VERSION_KEY, TRIP_UPDATES_VERSION_KEY, RT_TTL_SECONDS
+)
+from app.services.rt_archive import RealtimeArchiver
+from app.services.rt_parquet import ParquetSnapshotWriter
+from app.services.arrivals import build_arrivals_for_stops
+from app.services.schedule import agency_now
+from app.db.session import SessionLocal
+from app.models.gtfs import StopTime
 from app.core.config import settings
+from redis.exceptions import LockError
 import redis
-import json
+import time
 
 redis_client = redis.Redis.from_url(settings.REDIS_URL, decode_responses=True)
 
-@app.on_after_configure.connect
-def setup_periodic_tasks(sender, **kwargs):
-    # Poll Vehicle Positions every 10 seconds
-    sender.add_periodic_task(10.0, ingest_vehicle_positions.s(), name='ingest-vehicles-10s')
+# Conditional pollers: unchanged feeds are neither parsed nor re-written to Redis
+vehicle_positions_feed = FeedClient("vehicle_positions", VEHICLE_POSITIONS_URL, redis_client)
+trip_updates_feed = FeedClient("trip_updates", TRIP_UPDATES_URL, redis_client)
+service_alerts_feed = FeedClient("alerts", ALERTS_URL, redis_client)
+
+# History for training: new observations are buffered here and written to the rt_*
+# archive tables by a background thread. Started by the ingest daemon only.
+archiver = RealtimeArchiver()
+# Optional full-snapshot Parquet dataset for offline analytics (settings.RT_PARQUET_DIR)
+snapshots = ParquetSnapshotWriter(settings.RT_PARQUET_DIR)
+
+# The feeds are polled by the ingest daemon (rt_runner.py), each on its own schedule
+# adapted to the feed's publish cadence. The tasks below run the same single-feed
+# cycle and remain available for manual / ad-hoc runs.
+
+# Upper bound on one poll + publish (fetch timeout is 10s); the lock expires after it
+# so a crashed cycle cannot block its feed for good.
+FEED_LOCK_SECONDS = 60
+
+def read_vehicle_state() -> tuple:
+    """
+    State from the previous cycle, in one round trip: route sets (so emptied ones
+    can be dropped), fingerprints + version (for the delta feed), per-vehicle
+    content hashes (to skip unchanged documents).
+    """
+    read = redis_client.pipeline(transaction=False)
+    read.smembers(VEHICLE_ROUTES_KEY)
+    read.hgetall(VEHICLES_FINGERPRINTS_KEY)
+    read.get(VEHICLES_VERSION_KEY)
+    read.hgetall(VEHICLE_HASHES_KEY)
+    return tuple(read.execute())
+
+def read_trip_delay_hashes() -> dict:
+    return redis_client.hgetall(TRIP_DELAYS_HASHES_KEY)
+
+def queue_vehicle_positions(pipe, feed, vehicles: list, previous_state: tuple) -> list:
+    """Returns the vehicles whose documents changed (and were re-written)."""
+    previous_route_ids, previous_fingerprints, previous_version, previous_hashes = previous_state
+
+    # Snapshot version = feed timestamp (falls back to ingest time if the producer leaves it unset)
+    version = feed.header.timestamp or int(time.time())
+
+    # Cache latest state per vehicle, only re-written when its content changed
+    # Key: vehicle:{vehicle_id}
+    changed = cache_vehicles(pipe, vehicles, previous_hashes)
+    
+    # Lookup indexes for filtered /vehicles queries:
+    # vehicles:geo (GEO) and route_vehicles:{route_id} (Set of vehicle IDs)
+    cache_vehicle_indexes(pipe, vehicles, previous_route_ids)
+    
+    # Whole-fleet snapshot served as-is by GET /vehicles
+    cache_vehicles_snapshot(pipe, vehicles, version)
     
-    # Poll Trip Updates every 10 seconds
-    sender.add_periodic_task(10.0, ingest_trip_updates.s(), name='ingest-trips-10s')
+    # Change set for GET /vehicles?since=<version> (same feed timestamp = nothing new)
+    if str(version) != previous_version:
+        cache_vehicle_changes(pipe, vehicles, version, previous_fingerprints)
+    return changed
+
+def queue_trip_updates(pipe, feed, updates, previous_hashes: dict) -> list:
+    """Returns the indexes (into updates) of the trips whose delays changed (and were re-written)."""
+    # Per-trip stop_sequence -> delay index, straight from the columnar parse
+    # Keys: trip_delays:{trip_id}
+    changed = cache_trip_update_columns(pipe, updates, previous_hashes)
+    
+    pipe.set(TRIP_UPDATES_VERSION_KEY, feed.header.timestamp or int(time.time()), ex=RT_TTL_SECONDS)
+    return changed
+
+def queue_service_alerts(pipe, feed, alerts: list):
+    # An empty list is meaningful here: every alert was lifted
+    cache_service_alerts(pipe, alerts, feed.header.timestamp or int(time.time()))
+
+def rebuild_boards_for(updates):
+    """
+    Next stage: rebuild the arrival boards of every stop these updates
+    (gtfs_rt.TripUpdateColumns) touch. Updates without a stop_id are resolved
+    through the trip's schedule.
+    """
+    stop_ids = set(updates.stop_ids)
+    unresolved_trip_ids = set()
+    if "" in stop_ids:
+        stop_ids.discard("")
+        offsets = updates.offsets
+        unresolved_trip_ids = {
+            trip_id for i, trip_id in enumerate(updates.trip_ids)
+            if "" in updates.stop_ids[offsets[i]:offsets[i + 1]]
+        }
+    build_arrival_boards.delay(sorted(stop_ids), sorted(unresolved_trip_ids))
+
+def run_feed_cycle(client, process) -> tuple:
+    """
+    One poll of `client` and, when the feed changed, process(feed). Holds the feed's
+    lock throughout, so two cycles of the same feed never run at once, whichever
+    process (ingest daemon, Celery task) started them.
+    Returns (outcome, summary); outcome is client.last_outcome, or 'busy' when
+    another cycle held the lock.
+    """
+    lock = redis_client.lock(feed_lock_key(client.name), timeout=FEED_LOCK_SECONDS)
+    if not lock.acquire(blocking=False):
+        return 'busy', f"{client.name} cycle already running"
+    try:
+        feed = client.poll()
+        return client.last_outcome, process(feed)
+    finally:
+        try:
+            lock.release()
+        except LockError:
+            print(f"Feed lock for {client.name} expired before the cycle finished")
+
+def process_vehicle_positions(feed) -> str:
+    if feed is None:
+        touch_vehicles_snapshot(redis_client)
+        return "No new vehicle positions"
 
-@app.task
-def ingest_vehicle_positions():
-    print("Fetching Vehicle Positions...")
-    feed = fetch_feed(VEHICLE_POSITIONS_URL)
     vehicles = parse_vehicle_positions(feed)
     
     if not vehicles:
+        vehicle_positions_feed.mark_processed()
         return "No vehicles found"
 
+    previous_state = read_vehicle_state()
+
     # Pipeline Redis updates for performance
     pipe = redis_client.pipeline()
-    
-    for v in vehicles:
-        # Cache latest state per vehicle
-        # Key: vehicle:{vehicle_id}
-        key = f"vehicle:{v['vehicle_id']}"
-        pipe.set(key, json.dumps(v), ex=600) # Expire after 10 mins if no update
-        
-        # Also store by route for quick lookup
-        # Key: route_vehicles:{route_id} -> Set of vehicle IDs
-        # We need to manage this set carefully (remove if vehicle changes route)
-        # For MVP simple expiration might be enough or just scan. 
-        # Better: valid_vehicles:{route_id} list
-    
+    changed = queue_vehicle_positions(pipe, feed, vehicles, previous_state)
     pipe.execute()
+    vehicle_positions_feed.mark_processed()
     
-    # Telemetry / DB Archival would go here (omitted for MVP speed)
-    return f"Ingested {len(vehicles)} vehicles"
+    # Only buffered here: the archivers write to Postgres / Parquet off the ingest path
+    feed_timestamp = feed.header.timestamp or int(time.time())
+    archiver.add_vehicle_positions(changed, feed_timestamp)
+    snapshots.add_vehicle_positions(vehicles, feed_timestamp)
+    return f"Ingested {len(vehicles)} vehicles ({len(changed)} changed)"
 
-@app.task
-def ingest_trip_updates():
-    print("Fetching Trip Updates...")
-    feed = fetch_feed(TRIP_UPDATES_URL)
-    updates = parse_trip_updates(feed)
+def process_trip_updates(feed) -> str:
+    if feed is None:
+        return "No new trip updates"
+
+    updates = parse_trip_updates_columnar(feed)
     
     if not updates:
+        trip_updates_feed.mark_processed()
         return "No updates found"
         
+    previous_hashes = read_trip_delay_hashes()
     pipe = redis_client.pipeline()
-    
-    for u in updates:
-        # Cache trip update
-        # Key: trip_update:{trip_id}
-        key = f"trip_update:{u['trip_id']}"
-        pipe.set(key, json.dumps(u), ex=600)
-        
+    changed = queue_trip_updates(pipe, feed, updates, previous_hashes)
+    pipe.execute()
+    trip_updates_feed.mark_processed()
+
+    feed_timestamp = feed.header.timestamp or int(time.time())
+    archiver.add_trip_updates(updates, changed, feed_timestamp)
+    snapshots.add_trip_updates(updates, feed_timestamp)
+    rebuild_boards_for(updates)
+
+    return f"Ingested {len(updates)} trip updates ({len(changed)} changed)"
+
+def process_service_alerts(feed) -> str:
+    if feed is None:
+        return "No new service alerts"
+
+    alerts = parse_alerts(feed)
+    pipe = redis_client.pipeline()
+    queue_service_alerts(pipe, feed, alerts)
     pipe.execute()
-    return f"Ingested {len(updates)} trip updates"
+    service_alerts_feed.mark_processed()
+    return f"Ingested {len(alerts)} service alerts"
+
+@app.task
+def ingest_vehicle_positions():
+    print("Fetching Vehicle Positions...")
+    return run_feed_cycle(vehicle_positions_feed, process_vehicle_positions)[1]
+
+@app.task
+def ingest_trip_updates():
+    print("Fetching Trip Updates...")
+    return run_feed_cycle(trip_updates_feed, process_trip_updates)[1]
+
+@app.task
+def ingest_service_alerts():
+    print("Fetching Service Alerts...")
+    return run_feed_cycle(service_alerts_feed, process_service_alerts)[1]
+
+@app.task
+def build_arrival_boards(stop_ids: list, trip_ids: list = None):
+    """
+    Materializes arrival_board:{stop_id} (schedule + real-time delays + ML scoring)
+    once per feed cycle, so the API can answer with a single GET.
+    """
+    db = SessionLocal()
+    try:
+        stop_ids = set(stop_ids)
+        if trip_ids:
+            stop_ids.update(
+                sid for (sid,) in db.query(StopTime.stop_id).filter(StopTime.trip_id.in_(trip_ids)).distinct()
+            )
+
+        boards = build_arrivals_for_stops(db, redis_client, sorted(stop_ids), agency_now())
+        pipe = redis_client.pipeline()
+        for stop_id, arrivals in boards.items():
+            cache_arrival_board(pipe, stop_id, arrivals)
+        pipe.execute()
+
+        return f"Built {len(stop_ids)} arrival boards"
+    finally:
+        db.close()